@@ -1,5 +1,16 @@
+from aggregator import ScanAggregator  # NOQA
+from backfill import HaloScansBackfill  # NOQA
+from checkpoint import FileCheckpoint  # NOQA
+from checkpoint import SQLiteCheckpoint  # NOQA
 from haloscandetails import HaloScanDetails  # NOQA
 from haloscans import HaloScans  # NOQA
+from metrics import MetricsRegistry  # NOQA
+from multi_tenant import MultiTenantHaloScans  # NOQA
+from ndjson_sink import NDJSONSink  # NOQA
+from scan_cache import ScanCache  # NOQA
+from scan_filter import ScanFilter  # NOQA
+from seen_index import SeenIndex  # NOQA
+from session_manager import SessionManager  # NOQA
 from utility import Utility  # NOQA
 
 __author__ = "toolbox@cloudpassage.com"
@@ -0,0 +1,218 @@
+import collections
+import hashlib
+import math
+import struct
+import threading
+from utility import Utility
+
+
+class HyperLogLog(object):
+    """Approximate count of distinct strings, in fixed memory.
+
+    Keyword Args:
+        precision (int): Uses ``2 ** precision`` one-byte registers.  The
+            standard error is about ``1.04 / sqrt(2 ** precision)``.
+            Defaults to 12: 4 KiB, and about 1.6%.
+
+    """
+    def __init__(self, **kwargs):
+        self.precision = kwargs.get("precision", 12)
+        self.size = 1 << self.precision
+        self.registers = bytearray(self.size)
+        self.alpha = 0.7213 / (1 + 1.079 / self.size)
+
+    def add(self, value):
+        """Count one string."""
+        digest = hashlib.md5(value.encode("utf-8")).digest()
+        hashed = struct.unpack("<Q", digest[:8])[0]
+        index = hashed & (self.size - 1)
+        rest = hashed >> self.precision
+        bits = 64 - self.precision
+        rank = 1
+        while rank <= bits and not rest & 1:
+            rank += 1
+            rest >>= 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def __len__(self):
+        return int(round(self.estimate()))
+
+    def estimate(self):
+        """Return the estimated number of distinct strings."""
+        total = sum(2.0 ** -register for register in self.registers)
+        estimate = self.alpha * self.size * self.size / total
+        zeros = sum(1 for register in self.registers if not register)
+        if estimate <= 2.5 * self.size and zeros:
+            return self.size * math.log(float(self.size) / zeros)
+        return estimate
+
+
+class SpaceSaving(object):
+    """Approximate top-K heaviest items of a stream, in fixed memory.
+
+    Keeps ``capacity`` counters.  When a new item arrives and they're all
+    taken, the smallest counter is handed to the new item, which inherits
+    its count as ``error``.  Any item whose true total is above ``1 /
+    capacity`` of the stream's total is guaranteed to be kept, and every
+    count overestimates the truth by at most its ``error``.
+
+    Args:
+        capacity (int): Number of counters.
+
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counters = {}
+
+    def add(self, item, weight=1):
+        """Add ``weight`` to ``item``'s count."""
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0]
+        else:
+            smallest = min(self.counters,
+                           key=lambda key: self.counters[key][0])
+            floor = self.counters.pop(smallest)[0]
+            self.counters[item] = [floor + weight, floor]
+
+    def top(self, count):
+        """Return up to ``count`` ``(item, count, error)``, heaviest first."""
+        ranked = sorted(self.counters.items(), key=lambda x: -x[1][0])
+        return [(item, value[0], value[1])
+                for item, value in ranked[:count]]
+
+
+class ScanAggregator(object):
+    """Roll up scans as they're yielded, in constant memory.
+
+    Pass one to ``HaloScans`` (or ``MultiTenantHaloScans``) as
+    ``aggregator``, and every yielded scan is added to it.  ``snapshot()``
+    may then be called at any time, from any thread, to get:
+
+    * Totals since start, by module and status, plus scans with critical
+      findings and the number of failing findings.
+    * The same counts for each ``bucket_seconds`` of ``created_at``, for the
+      latest ``window_buckets`` buckets, and the scan rate over that window.
+    * The ``top_k`` servers with the most failing findings (approximate;
+      see ``SpaceSaving``).
+    * The approximate number of distinct servers scanned (see
+      ``HyperLogLog``).
+
+    A scan's failing findings are its critical plus non-critical findings
+    counts, or, for FIM scans without those, the findings with a status of
+    ``bad``.
+
+    Keyword Args:
+        bucket_seconds (int): Width of each time bucket.  Defaults to 60.
+        window_buckets (int): Number of buckets kept.  Defaults to 60.
+        top_k (int): Number of servers to report.  Defaults to 10.
+        top_k_capacity (int): Counters kept for top servers.  More counters
+            make the top ``top_k`` more accurate.  Defaults to ``top_k * 10``.
+        hll_precision (int): ``HyperLogLog`` precision.  Defaults to 12.
+
+    """
+    def __init__(self, **kwargs):
+        self.bucket_seconds = kwargs.get("bucket_seconds", 60)
+        self.window_buckets = kwargs.get("window_buckets", 60)
+        self.top_k = kwargs.get("top_k", 10)
+        capacity = kwargs.get("top_k_capacity", self.top_k * 10)
+        self.top_servers = SpaceSaving(capacity)
+        self.servers = HyperLogLog(precision=kwargs.get("hll_precision", 12))
+        self.totals = self.new_rollup()
+        self.buckets = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    @classmethod
+    def new_rollup(cls):
+        """Return an empty set of counters."""
+        return {"scans": 0, "critical_scans": 0, "failing_findings": 0,
+                "by_module": collections.Counter(),
+                "by_status": collections.Counter()}
+
+    @classmethod
+    def failing_findings(cls, scan):
+        """Return the number of failing findings in a scan."""
+        counts = [scan.get("critical_findings_count"),
+                  scan.get("non_critical_findings_count")]
+        if any(count is not None for count in counts):
+            return sum(count or 0 for count in counts)
+        findings = scan.get("findings") or []
+        return sum(1 for finding in findings
+                   if finding.get("status") == "bad")
+
+    def add(self, scan):
+        """Add one scan to the rollups."""
+        failing = self.failing_findings(scan)
+        created = Utility.iso8601_to_epoch(scan["created_at"])
+        bucket = int(created // self.bucket_seconds) * self.bucket_seconds
+        with self.lock:
+            rollup = self.buckets.get(bucket)
+            if rollup is None:
+                if self.buckets and bucket < self.oldest_kept():
+                    rollup = None  # Too old for the window.
+                else:
+                    rollup = self.new_rollup()
+                    self.buckets[bucket] = rollup
+                    self.evict()
+            for counters in [self.totals, rollup]:
+                if counters is not None:
+                    self.count(counters, scan, failing)
+            server_id = scan.get("server_id")
+            if server_id is not None:
+                self.servers.add(server_id)
+                if failing:
+                    self.top_servers.add(server_id, failing)
+
+    @classmethod
+    def count(cls, counters, scan, failing):
+        """Add a scan to one set of counters."""
+        counters["scans"] += 1
+        counters["by_module"][scan["module"]] += 1
+        counters["by_status"][scan["status"]] += 1
+        if scan.get("critical_findings_count"):
+            counters["critical_scans"] += 1
+        counters["failing_findings"] += failing
+
+    def oldest_kept(self):
+        """Return the start of the oldest bucket in the window."""
+        newest = max(self.buckets)
+        return newest - (self.window_buckets - 1) * self.bucket_seconds
+
+    def evict(self):
+        """Drop buckets which have left the window.  Hold the lock."""
+        horizon = self.oldest_kept()
+        for bucket in [x for x in self.buckets if x < horizon]:
+            del self.buckets[bucket]
+
+    def snapshot(self):
+        """Return the current rollups as a dict of plain values."""
+        with self.lock:
+            buckets = [dict(self.plain(rollup),
+                            start=Utility.epoch_to_iso8601(start))
+                       for start, rollup in sorted(self.buckets.items())]
+            window = self.new_rollup()
+            for rollup in self.buckets.values():
+                for key in ["scans", "critical_scans", "failing_findings"]:
+                    window[key] += rollup[key]
+                window["by_module"].update(rollup["by_module"])
+                window["by_status"].update(rollup["by_status"])
+            window = self.plain(window)
+            seconds = len(self.buckets) * self.bucket_seconds
+            window["scans_per_second"] = (
+                window["scans"] / float(seconds) if seconds else 0.0)
+            return {"totals": self.plain(self.totals),
+                    "window": window,
+                    "buckets": buckets,
+                    "top_servers": self.top_servers.top(self.top_k),
+                    "distinct_servers": len(self.servers)}
+
+    @classmethod
+    def plain(cls, rollup):
+        """Return a copy of a rollup, with plain dicts for counters."""
+        result = dict(rollup)
+        result["by_module"] = dict(rollup["by_module"])
+        result["by_status"] = dict(rollup["by_status"])
+        return result
@@ -0,0 +1,137 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+from haloscans import HaloScans
+from utility import Utility
+
+
+def backfill_shard(shard):
+    """Write every scan in one time window to an NDJSON file.
+
+    This runs in a worker process.
+
+    Args:
+        shard (tuple): halo_key, halo_secret, start_timestamp, end_timestamp,
+            output path and kwargs for HaloScans.
+
+    Returns:
+        tuple: Output path and number of scans written.
+
+    Raises:
+        RuntimeError: If the stream stopped before the whole window was
+            retrieved.
+
+    """
+    halo_key, halo_secret, start, end, path, kwargs = shard
+    scans = HaloScans(halo_key, halo_secret, start_timestamp=start,
+                      end_timestamp=end, **kwargs)
+    count = 0
+    with open(path, "w") as shard_file:
+        for scan in scans:
+            shard_file.write(json.dumps(scan, default=Utility.json_default) +
+                             "\n")
+            count += 1
+    if not scans.ingest_complete:
+        raise RuntimeError("Backfill of %s to %s stopped early" % (start, end))
+    return path, count
+
+
+class HaloScansBackfill(object):
+    """Retrieve historical scans for a fixed time range, in parallel.
+
+    The range from ``start_timestamp`` to ``end_timestamp`` is split into
+    ``shards`` equal time windows.  Each window is ingested and enriched by
+    its own ``HaloScans`` instance, in its own process, and written to its
+    own NDJSON file.  Iterating over this object yields every scan in
+    ``created_at`` order: shards don't overlap, so we yield each shard's file
+    in turn, as soon as it and every shard before it is complete.
+
+    Args:
+        halo_key (str): API key for CloudPassage Halo
+        halo_secret (str): API key secret for CloudPassage Halo
+        start_timestamp (str): ISO8601 timestamp for start of backfill.
+        end_timestamp (str): ISO8601 timestamp for end of backfill.  Scans
+            created at exactly this time are not included.
+
+    Keyword Args:
+        shards (int): Number of time windows.  Defaults to ``processes``.
+        processes (int): Max number of worker processes.  Defaults to the
+            number of CPUs.
+        output_dir (str): If set, shard files are written here and kept.
+            Otherwise, they go to a temporary directory and each is removed
+            once it has been yielded.
+
+    Any other kwargs are passed to each shard's ``HaloScans``, and must be
+    picklable.  ``checkpoint``, ``session_manager``, ``cache`` and
+    ``seen_index`` are not supported.  Shards don't overlap, and each one
+    drops its own duplicates.
+
+    """
+    def __init__(self, halo_key, halo_secret, start_timestamp, end_timestamp,
+                 **kwargs):
+        self.halo_key = halo_key
+        self.halo_secret = halo_secret
+        self.start_timestamp = start_timestamp
+        self.end_timestamp = end_timestamp
+        self.processes = kwargs.pop("processes", multiprocessing.cpu_count())
+        self.shards = kwargs.pop("shards", self.processes)
+        self.output_dir = kwargs.pop("output_dir", None)
+        for arg in ["checkpoint", "session_manager", "cache", "seen_index"]:
+            if arg in kwargs:
+                raise ValueError("%s is not supported for backfill" % arg)
+        self.kwargs = kwargs
+
+    def __iter__(self):
+        """Yield every scan in the time range, in created_at order."""
+        keep_files = self.output_dir is not None
+        output_dir = self.output_dir or tempfile.mkdtemp()
+        try:
+            for path, count in self.run_shards(output_dir):
+                with open(path) as shard_file:
+                    for line in shard_file:
+                        yield json.loads(line)
+                if not keep_files:
+                    os.remove(path)
+        finally:
+            if not keep_files:
+                shutil.rmtree(output_dir, ignore_errors=True)
+
+    def run(self):
+        """Backfill every shard to ``output_dir``, without yielding scans.
+
+        Returns:
+            list: Tuples of (path, scan count), one per shard, in order.
+
+        """
+        if self.output_dir is None:
+            raise ValueError("output_dir is required to run without yielding")
+        return list(self.run_shards(self.output_dir))
+
+    def run_shards(self, output_dir):
+        """Run shards in worker processes, yielding results in shard order."""
+        shards = []
+        for index, (start, end) in enumerate(self.get_windows()):
+            path = os.path.join(output_dir, "scans_%04d.ndjson" % index)
+            shards.append((self.halo_key, self.halo_secret, start, end, path,
+                           self.kwargs))
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            for result in pool.imap(backfill_shard, shards):
+                yield result
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def get_windows(self):
+        """Return (start, end) ISO8601 timestamps for each shard."""
+        start = Utility.iso8601_to_epoch(self.start_timestamp)
+        end = Utility.iso8601_to_epoch(self.end_timestamp)
+        width = (end - start) / self.shards
+        bounds = [Utility.epoch_to_iso8601(start + (width * x))
+                  for x in range(self.shards)]
+        bounds.append(self.end_timestamp)
+        bounds[0] = self.start_timestamp
+        return zip(bounds[:-1], bounds[1:])
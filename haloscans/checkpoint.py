@@ -0,0 +1,93 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+
+class FileCheckpoint(object):
+    """Keep the scan stream's position in a local JSON file.
+
+    The position is the ``created_at`` watermark of the last scan committed,
+    plus the IDs of every committed scan carrying that exact timestamp.  Each
+    save writes a temporary file beside the checkpoint, syncs it to disk and
+    renames it over the old checkpoint, so a crash never leaves a partial
+    checkpoint behind.
+
+    Args:
+        path (str): Path to checkpoint file.
+
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Return the saved position, or None if nothing has been saved.
+
+        Returns:
+            dict: ``{"created_at": "2018-01-01T00:00:00.000Z", "ids": []}``
+
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as checkpoint_file:
+            return json.load(checkpoint_file)
+
+    def save(self, created_at, ids):
+        """Atomically replace the saved position."""
+        state = {"created_at": created_at, "ids": list(ids)}
+        directory = os.path.dirname(os.path.abspath(self.path))
+        tmp = tempfile.NamedTemporaryFile("w", dir=directory, delete=False)
+        try:
+            json.dump(state, tmp)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+            tmp.close()
+            os.rename(tmp.name, self.path)
+        except Exception:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+
+
+class SQLiteCheckpoint(object):
+    """Keep the scan stream's position in a SQLite database.
+
+    Several streams may share one database, each under its own ``name``.
+    Each save is a single transaction.
+
+    Args:
+        path (str): Path to SQLite database file.
+
+    Keyword Args:
+        name (str): Name of this stream's checkpoint.  Defaults to
+            ``haloscans``.
+
+    """
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self.name = kwargs.get("name", "haloscans")
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS checkpoint "
+                              "(name TEXT PRIMARY KEY, created_at TEXT, "
+                              "ids TEXT)")
+
+    def load(self):
+        """Return the saved position, or None if nothing has been saved."""
+        with self.lock:
+            row = self.conn.execute("SELECT created_at, ids FROM checkpoint "
+                                    "WHERE name = ?", (self.name,)).fetchone()
+        if row is None:
+            return None
+        return {"created_at": row[0], "ids": json.loads(row[1])}
+
+    def save(self, created_at, ids):
+        """Atomically replace the saved position."""
+        with self.lock:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO checkpoint "
+                                  "(name, created_at, ids) VALUES (?, ?, ?)",
+                                  (self.name, created_at,
+                                   json.dumps(list(ids))))
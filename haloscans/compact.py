@@ -0,0 +1,171 @@
+import collections
+
+
+class StringInterner(object):
+    """Share one copy of each repeated string.
+
+    Scans repeat the same keys and values (modules, statuses, server IDs,
+    rule names, file paths) thousands of times.  Interning them means each
+    distinct string is stored once, however many scans and findings use it.
+    Once ``max_size`` distinct strings are held, new strings are no longer
+    added, so memory stays bounded on a stream that runs forever.
+
+    Keyword Args:
+        max_size (int): Max number of distinct strings to hold.  Defaults to
+            100000.
+
+    """
+    def __init__(self, **kwargs):
+        self.max_size = kwargs.get("max_size", 100000)
+        self.strings = {}
+        self.indexes = {}
+
+    def intern(self, value):
+        """Return the shared copy of ``value``, interning nested values."""
+        if isinstance(value, basestring):
+            shared = self.strings.get(value)
+            if shared is not None:
+                return shared
+            if len(self.strings) < self.max_size:
+                self.strings[value] = value
+            return value
+        if isinstance(value, dict):
+            return dict((self.intern(k), self.intern(v))
+                        for k, v in value.items())
+        if isinstance(value, list):
+            return [self.intern(item) for item in value]
+        return value
+
+    def index(self, keys):
+        """Return a shared {key: position} index for a tuple of keys."""
+        return self.shared_keys(keys)[1]
+
+    def key_tuple(self, keys):
+        """Return the shared copy of a tuple of keys."""
+        return self.shared_keys(keys)[0]
+
+    def shared_keys(self, keys):
+        """Return the shared (keys, index) pair for a tuple of keys."""
+        shared = self.indexes.get(keys)
+        if shared is None:
+            index = dict((key, pos) for pos, key in enumerate(keys))
+            shared = (keys, index)
+            self.indexes[keys] = shared
+        return shared
+
+
+class FindingTable(collections.Sequence):
+    """Column-oriented list of findings, read back as dicts.
+
+    Each key is stored once, as a column, instead of once per finding dict,
+    and values are interned.
+
+    Args:
+        interner (StringInterner): Interner for keys and values.
+
+    """
+    missing = object()
+
+    def __init__(self, interner):
+        self.interner = interner
+        self.columns = collections.OrderedDict()
+        self.rows = 0
+
+    @classmethod
+    def from_pages(cls, pages, pagination_key, interner):
+        """Build a table from API pages, like ``Utility.items_from_pages``."""
+        table = cls(interner)
+        for page in pages:
+            table.extend(page[pagination_key])
+        return table
+
+    def extend(self, findings):
+        """Append a list of finding dicts."""
+        for finding in findings:
+            self.append(finding)
+
+    def append(self, finding):
+        """Append one finding dict."""
+        for key in finding:
+            if key not in self.columns:
+                column = [self.missing] * self.rows
+                self.columns[self.interner.intern(key)] = column
+        for key, column in self.columns.items():
+            column.append(self.interner.intern(finding.get(key,
+                                                           self.missing)))
+        self.rows += 1
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.rows))]
+        if index < 0:
+            index += self.rows
+        if not 0 <= index < self.rows:
+            raise IndexError("finding index out of range")
+        return dict((key, column[index])
+                    for key, column in self.columns.items()
+                    if column[index] is not self.missing)
+
+    def to_json(self):
+        """Return a JSON-serializable list of finding dicts."""
+        return list(self)
+
+
+class CompactScan(collections.Mapping):
+    """Read-only scan document with interned keys and values.
+
+    Behaves like the scan dict it was built from.  Keys are kept in an index
+    shared by every scan with the same set of keys, FIM findings are kept in
+    a ``FindingTable``, and every string is interned.  Use ``to_dict()`` for
+    a plain, mutable copy.
+
+    Args:
+        scan (dict): Scan document.
+        interner (StringInterner): Interner shared by all scans.
+
+    """
+    __slots__ = ("fields", "index", "values")
+
+    def __init__(self, scan, interner):
+        keys = tuple(interner.intern(key) for key in scan)
+        self.index = interner.index(keys)
+        self.fields = interner.key_tuple(keys)
+        values = []
+        for key in keys:
+            value = scan[key]
+            if key == "findings" and isinstance(value, list):
+                table = FindingTable(interner)
+                table.extend(value)
+                value = table
+            else:
+                value = interner.intern(value)
+            values.append(value)
+        self.values = tuple(values)
+
+    def __getitem__(self, key):
+        return self.values[self.index[key]]
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return "CompactScan(%r)" % self.to_dict()
+
+    def to_dict(self):
+        """Return the scan as a plain dict, with findings as a list."""
+        result = {}
+        for key, value in self.items():
+            if isinstance(value, FindingTable):
+                value = value.to_json()
+            result[key] = value
+        return result
+
+    def to_json(self):
+        """Return a JSON-serializable dict."""
+        return self.to_dict()
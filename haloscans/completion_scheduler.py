@@ -0,0 +1,168 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class CompletionScheduler(object):
+    """Park incomplete scans and re-poll them with exponential backoff.
+
+    Rather than have each enrichment worker sleep on its own scan, workers
+    hand incomplete scans to this scheduler and move on.  One poller thread
+    keeps a priority queue of scans ordered by when they're next due to be
+    checked, and re-polls every due scan each time it wakes up.  The delay
+    between polls for a given scan doubles each time, up to ``max_delay``,
+    and a scan is never re-polled later than its deadline.
+
+    Once a scan completes, or reaches its deadline, it is passed to
+    ``ready_callback`` from the poller thread.  If polling raises an
+    exception, the poller stops and the exception is kept in ``error``.
+
+    Args:
+        poll_callback (callable): Takes a scan body, returns a fresh one.
+        complete_callback (callable): Takes a scan body, returns True if the
+            scan is complete.
+        ready_callback (callable): Called with ``key`` and the final scan
+            body for each scan we are done waiting on.
+
+    Keyword Args:
+        initial_delay (int): Seconds to wait before the first re-poll.
+            Defaults to 5.
+        max_delay (int): Longest wait between re-polls.  Defaults to 60.
+
+    """
+    def __init__(self, poll_callback, complete_callback, ready_callback,
+                 **kwargs):
+        self.poll_callback = poll_callback
+        self.complete_callback = complete_callback
+        self.ready_callback = ready_callback
+        self.initial_delay = kwargs.get("initial_delay", 5)
+        self.max_delay = kwargs.get("max_delay", 60)
+        self.error = None
+        self.stopped = False
+        self.schedule = []
+        self.counter = itertools.count()
+        self.cond = threading.Condition()
+        self.poller = None
+
+    def __len__(self):
+        return len(self.schedule)
+
+    def start(self):
+        """Start the poller thread."""
+        self.stopped = False
+        self.poller = threading.Thread(target=self.run)
+        self.poller.daemon = True
+        self.poller.start()
+
+    def stop(self):
+        """Stop the poller thread.  Parked scans are abandoned."""
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+
+    def defer(self, key, scan_body, deadline):
+        """Park ``scan_body`` until it completes or ``deadline`` passes.
+
+        Args:
+            key (object): Handed back to ``ready_callback`` with the scan.
+            scan_body (dict): Incomplete scan, as retrieved from the API.
+            deadline (float): Epoch time after which we give up waiting.
+
+        """
+        self.push(key, scan_body, deadline, self.initial_delay)
+
+    def push(self, key, scan_body, deadline, delay):
+        """Schedule the next poll for a scan, no later than its deadline."""
+        due = min(time.time() + delay, deadline)
+        entry = (due, next(self.counter), key, scan_body, deadline, delay)
+        with self.cond:
+            heapq.heappush(self.schedule, entry)
+            self.cond.notify()
+
+    def pop_due(self):
+        """Block until at least one scan is due, then return all due scans."""
+        with self.cond:
+            while not self.stopped:
+                now = time.time()
+                if self.schedule and self.schedule[0][0] <= now:
+                    due = []
+                    while self.schedule and self.schedule[0][0] <= now:
+                        due.append(heapq.heappop(self.schedule))
+                    return due
+                timeout = self.schedule[0][0] - now if self.schedule else 1
+                self.cond.wait(timeout)
+        return []
+
+    def run(self):
+        """Re-poll due scans until stopped."""
+        try:
+            while not self.stopped:
+                for entry in self.pop_due():
+                    self.poll(*entry[2:])
+        except Exception as e:
+            self.error = e
+            self.stopped = True
+
+    def poll(self, key, scan_body, deadline, delay):
+        """Re-check one scan, and either release or re-schedule it."""
+        scan_body = self.poll_callback(scan_body)
+        if self.complete_callback(scan_body) or time.time() >= deadline:
+            self.ready_callback(key, scan_body)
+        else:
+            self.push(key, scan_body, deadline,
+                      min(delay * 2, self.max_delay))
+
+
+class SharedCompletionScheduler(CompletionScheduler):
+    """One ``CompletionScheduler`` for several ``HaloScans`` streams.
+
+    Each stream defers scans through its own ``view()`` of the scheduler.
+    Scans are polled and released through the callbacks of the stream which
+    deferred them (``poll_scan``, ``poll_complete`` and ``resume_scan``), so
+    every stream's scans are polled with its own session, by one thread.
+
+    Keyword Args:
+        initial_delay (int): As for ``CompletionScheduler``.
+        max_delay (int): As for ``CompletionScheduler``.
+
+    """
+    def __init__(self, **kwargs):
+        super(SharedCompletionScheduler, self).__init__(None, None, None,
+                                                        **kwargs)
+
+    def view(self, stream):
+        """Return a scheduler for ``stream`` to defer its scans to."""
+        return SchedulerView(self, stream)
+
+    def poll(self, key, scan_body, deadline, delay):
+        """Re-check one scan, with its stream's callbacks."""
+        stream, stream_key = key
+        scan_body = stream.poll_scan(scan_body)
+        if stream.poll_complete(scan_body) or time.time() >= deadline:
+            stream.resume_scan(stream_key, scan_body)
+        else:
+            self.push(key, scan_body, deadline,
+                      min(delay * 2, self.max_delay))
+
+
+class SchedulerView(object):
+    """One stream's handle on a ``SharedCompletionScheduler``."""
+    def __init__(self, scheduler, stream):
+        self.scheduler = scheduler
+        self.stream = stream
+
+    def __len__(self):
+        return len(self.scheduler)
+
+    @property
+    def error(self):
+        return self.scheduler.error
+
+    def defer(self, key, scan_body, deadline):
+        """Park ``scan_body``, as with ``CompletionScheduler.defer()``."""
+        self.scheduler.defer((self.stream, key), scan_body, deadline)
+
+    def stop(self):
+        """Streams don't stop the shared scheduler.  Its owner does."""
+        pass
@@ -0,0 +1,82 @@
+import threading
+import time
+
+
+class AdaptiveConcurrencyLimiter(object):
+    """Limit concurrent requests, adjusting the limit AIMD-style.
+
+    Callers ``acquire()`` a slot before making a request, and ``release()``
+    it afterwards with the request's outcome.  Every request which is neither
+    throttled nor slower than ``latency_target`` raises the limit by
+    ``1 / limit``, so the limit grows by about one per round of requests.  A
+    throttled or slow request cuts the limit by ``backoff_ratio``.  Requests
+    which started before the last cut don't cut it again, so one burst of
+    429s costs one cut rather than one per request in flight.
+
+    The limit never leaves ``min_limit``..``max_limit``.  If they're equal,
+    this is a plain fixed-size semaphore.
+
+    Args:
+        min_limit (int): Lowest the limit can go.
+        max_limit (int): Highest the limit can go.
+
+    Keyword Args:
+        initial_limit (int): Starting limit.  Defaults to ``max_limit``.
+        latency_target (float): Requests slower than this many seconds count
+            as congestion.  Defaults to None, so only throttling does.
+        backoff_ratio (float): Multiply the limit by this on congestion.
+            Defaults to 0.5.
+
+    """
+    def __init__(self, min_limit, max_limit, **kwargs):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.current_limit = float(kwargs.get("initial_limit", max_limit))
+        self.latency_target = kwargs.get("latency_target")
+        self.backoff_ratio = kwargs.get("backoff_ratio", 0.5)
+        self.in_use = 0
+        self.last_decrease = 0
+        self.cond = threading.Condition()
+
+    @property
+    def limit(self):
+        """The current limit, as a whole number of requests."""
+        return int(self.current_limit)
+
+    def acquire(self):
+        """Wait for a free slot.
+
+        Returns:
+            float: Time the slot was acquired.  Pass this to ``release()``.
+
+        """
+        with self.cond:
+            while self.in_use >= self.limit:
+                self.cond.wait()
+            self.in_use += 1
+        return time.time()
+
+    def release(self, started, throttled=False):
+        """Free a slot, and adjust the limit from the request's outcome.
+
+        Args:
+            started (float): Value returned by ``acquire()``.
+            throttled (bool): True if the API throttled this request.
+
+        """
+        latency = time.time() - started
+        slow = (self.latency_target is not None and
+                latency > self.latency_target)
+        with self.cond:
+            self.in_use -= 1
+            if throttled or slow:
+                if started >= self.last_decrease:
+                    self.current_limit = max(self.min_limit,
+                                             self.current_limit *
+                                             self.backoff_ratio)
+                    self.last_decrease = time.time()
+            else:
+                self.current_limit = min(self.max_limit,
+                                         self.current_limit +
+                                         1.0 / self.current_limit)
+            self.cond.notify_all()
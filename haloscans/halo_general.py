@@ -21,7 +21,21 @@ class HaloGeneral(object):
         """We map pages to threads, return results when it's all done."""
         halo_session = cls.build_halo_session(halo_key, halo_secret, api_host,
                                               api_port, ua)
+        return cls.get_pages_with_session(halo_session, max_threads, url_list)
+
+    @classmethod
+    def get_pages_with_session(cls, halo_session, max_threads, url_list,
+                               pool=None):
+        """Like get_pages(), but borrows an already-authenticated session.
+
+        If ``pool`` is set, pages are retrieved by that long-lived thread
+        pool, which may be shared by many callers, and ``max_threads`` is
+        ignored.  Otherwise, a pool is started and stopped for this call.
+        Either way, pages are returned in the same order as ``url_list``.
+        """
         page_helper = cloudpassage.HttpHelper(halo_session)
+        if pool is not None:
+            return pool.map(page_helper.get, url_list)
         pool = ThreadPool(max_threads)
         results = pool.map(page_helper.get, url_list)
         pool.close()
@@ -1,10 +1,46 @@
 import cloudpassage
+import threading
 import time
+from compact import CompactScan, FindingTable, StringInterner
 from halo_general import HaloGeneral
+from multiprocessing.dummy import Pool as ThreadPool
+from session_manager import SessionManager
 from utility import Utility
 
 
 class HaloScanDetails(object):
+    """Retrieve scan details, including FIM findings, from the Halo API.
+
+    Args:
+        halo_key (str): API key for CloudPassage Halo
+        halo_secret (str): API key secret for CloudPassage Halo
+
+    Keyword Args:
+        api_host (str): Hostname for Halo API.  Default is api.cloudpassage.com
+        api_port (str): Port for API endpoint.  Defaults to 443
+        max_threads (int): Size of the thread pool which retrieves FIM
+            findings.  One long-lived pool is shared by every scan this
+            object enriches, from any thread.  Defaults to 4.
+        scan_timeout (int): Max seconds to wait on scan completion.
+        integration_name (str): Name of the tool using this library.
+        session_manager (SessionManager): Shared session manager.  If not
+            set, this object builds its own.
+        metrics (MetricsRegistry): If set, FIM findings retrieval time and
+            cache hits are recorded here.
+        cache (ScanCache): If set, completed scans are looked up here before
+            going to the API, and stored here once enriched.
+        fields (list): If set, keep only these top-level fields of each scan
+            document, dropping the rest as soon as it's retrieved.  ``id``,
+            ``module``, ``status`` and ``created_at`` are always kept.  FIM
+            findings details are only retrieved if ``findings`` is listed.
+        compact_records (bool): If True, FIM findings are collected into a
+            column-oriented ``FindingTable`` with interned strings, and
+            ``compact()`` returns ``CompactScan`` records.  Defaults to False.
+
+    """
+    incomplete_statuses = ["queued", "pending", "running"]
+    essential_fields = ["id", "module", "status", "created_at"]
+
     def __init__(self, halo_key, halo_secret, **kwargs):
         self.halo_key = halo_key
         self.halo_secret = halo_secret
@@ -15,19 +51,112 @@ class HaloScanDetails(object):
         self.ua = Utility.build_ua("")
         self.search_params = {}
         self.scan_timeout = 300
+        self.session_manager = None
+        self.metrics = None
+        self.cache = None
+        self.fields = None
+        self.compact_records = False
         self.set_attrs_from_kwargs(kwargs)
+        self.interner = StringInterner() if self.compact_records else None
+        self.findings_pool = None
+        self.findings_pool_lock = threading.Lock()
+        if self.metrics is not None:
+            self.register_metrics()
+        if self.session_manager is None:
+            self.session_manager = SessionManager(halo_key, halo_secret,
+                                                  api_host=self.api_host,
+                                                  api_port=self.api_port,
+                                                  ua=self.ua,
+                                                  pool_size=self.max_threads)
+
+    def register_metrics(self):
+        """Create FIM findings and cache metrics."""
+        self.fim_fetch = self.metrics.histogram(
+            "haloscans_fim_fetch_seconds", "FIM findings retrieval time.")
+        self.cache_lookups = self.metrics.counter(
+            "haloscans_cache_lookups_total", "Scan cache lookups.",
+            labelnames=["result"])
 
     def get(self, scan_id):
         """This wraps other functions that get specific scan details"""
-        scan = cloudpassage.Scan(self.halo_session)
-        details = scan.scan_details(scan_id)
+        details = self.get_cached(scan_id)
+        if details is not None:
+            return details
+        details = self.get_scan(scan_id)
         details = self.hold_for_completion(details)
-        if details["module"] == "fim":
+        return self.finalize(details)
+
+    def get_scan(self, scan_id):
+        """Get the scan document, as-is, from the Halo API."""
+        scan = cloudpassage.Scan(self.session_manager.get_session())
+        return self.project(scan.scan_details(scan_id))
+
+    def project(self, details):
+        """Drop fields we weren't asked for from a scan document."""
+        if self.fields is None:
+            return details
+        keep = set(self.fields + self.essential_fields)
+        return dict((key, value) for key, value in details.items()
+                    if key in keep)
+
+    def wants_findings(self, details):
+        """Return True if we should retrieve FIM findings for this scan."""
+        if details["module"] != "fim":
+            return False
+        return self.fields is None or "findings" in self.fields
+
+    def get_cached(self, scan_id):
+        """Return the enriched scan from the cache, or None."""
+        if self.cache is None:
+            return None
+        details = self.cache.get(scan_id)
+        if self.metrics is not None:
+            result = "miss" if details is None else "hit"
+            self.cache_lookups.inc(result=result)
+        return details
+
+    def finalize(self, details):
+        """Finish enriching a scan which we're done waiting on.
+
+        Completed scans are stored in the cache, if we have one.  Scans we
+        gave up waiting on are not.
+        """
+        if self.wants_findings(details):
             new_deets = self.enrich_fim(details)
             details["findings"] = None
             details["findings"] = new_deets
+        if self.cache is not None and self.is_complete(details):
+            self.cache.put(details)
         return details
 
+    def is_complete(self, scan_body):
+        """Return True if the scan's status indicates completion."""
+        return scan_body["status"] not in self.incomplete_statuses
+
+    def deadline(self, scan_body, created=None):
+        """Return the epoch time after which we stop waiting on this scan.
+
+        Args:
+            scan_body (dict): Scan details.
+            created (float): The scan's ``created_at``, as epoch seconds, if
+                it's already known.
+
+        """
+        if created is None:
+            created = Utility.iso8601_to_epoch(scan_body["created_at"])
+        return created + self.scan_timeout
+
+    def timed_out(self, scan_body, created=None):
+        """Return True, with a message, if we've waited long enough."""
+        if created is None:
+            created = Utility.iso8601_to_epoch(scan_body["created_at"])
+        waited = time.time() - created
+        if waited < self.scan_timeout:
+            return False
+        print("Not waiting on scan with ID %s anymore...(%d seconds)" %
+              (scan_body["id"], waited))
+        return True
+
     def hold_for_completion(self, scan_body):
         """Wait for completion and return completed scan.
 
@@ -35,43 +164,70 @@ class HaloScanDetails(object):
         queued, pending, or running, we wait and re-query until the status
         indicates completion.
 
-        We don't wait more than 6 minutes for a scan to complete, though.
+        We don't wait more than ``scan_timeout`` seconds after the scan's
+        ``created_at`` timestamp for a scan to complete, though.
+
+        This blocks the calling thread while waiting.  ``HaloScans`` hands
+        incomplete scans off to a ``CompletionScheduler`` instead.
 
         Args:
             scan_body(dict): Body of scan from API.
 
         """
         wait_time = 10
-        scan = cloudpassage.Scan(self.halo_session)
-        # time_waited = 0
-        while scan_body["status"] in ["queued", "pending", "running"]:
-            # if time_waited >= self.scan_timeout:
-            t_delta = Utility.iso_8601_delta(Utility.iso8601_now(),
-                                             scan_body["created_at"])
-            if abs(t_delta.seconds) > self.scan_timeout:
-                print("Not waiting on scan with ID %s anymore...(%s seconds)" %
-                      (scan_body["id"], abs(t_delta.seconds)))
+        created = None
+        while not self.is_complete(scan_body):
+            if created is None:
+                created = Utility.iso8601_to_epoch(scan_body["created_at"])
+            if self.timed_out(scan_body, created):
                 break
             time.sleep(wait_time)
-            # time_waited += wait_time
-            scan_body = scan.scan_details(scan_body["id"])
+            scan_body = self.get_scan(scan_body["id"])
         return scan_body
 
     def enrich_fim(self, scan_document):
         """Return a Halo FIM scan, enriched with findings information."""
+        started = time.time()
         findings = []
         for finding in scan_document["findings"]:
             findings_url = "/v1/scans/%s/findings/%s" % (scan_document["id"],
                                                          finding["id"])
             findings.append(findings_url)
-        results = HaloGeneral.get_pages(self.halo_key, self.halo_secret,
-                                        self.api_host, self.api_port, self.ua,
-                                        self.max_threads, findings)
+        halo_session = self.session_manager.get_session()
+        results = HaloGeneral.get_pages_with_session(
+            halo_session, self.max_threads, findings,
+            pool=self.get_findings_pool())
+        if self.metrics is not None:
+            self.fim_fetch.observe(time.time() - started)
+        if self.compact_records:
+            return FindingTable.from_pages(results, "findings", self.interner)
         return Utility.items_from_pages(results, "findings")
 
+    def get_findings_pool(self):
+        """Return the shared FIM findings thread pool, starting it once."""
+        with self.findings_pool_lock:
+            if self.findings_pool is None:
+                self.findings_pool = ThreadPool(self.max_threads)
+            return self.findings_pool
+
+    def close(self):
+        """Stop the FIM findings thread pool.  It restarts if needed."""
+        with self.findings_pool_lock:
+            if self.findings_pool is not None:
+                self.findings_pool.close()
+                self.findings_pool = None
+
+    def compact(self, details):
+        """Return a ``CompactScan`` for ``details``, if compact_records."""
+        if not self.compact_records or isinstance(details, CompactScan):
+            return details
+        return CompactScan(details, self.interner)
+
     def set_attrs_from_kwargs(self, kwargs):
         """Set instance attributes from kwargs."""
-        arg_list = ["max_threads", "api_host", "api_port", "scan_timeout"]
+        arg_list = ["max_threads", "api_host", "api_port", "scan_timeout",
+                    "session_manager", "metrics", "cache", "fields",
+                    "compact_records"]
         for arg in arg_list:
             if arg in kwargs:
                 setattr(self, arg, kwargs[arg])
@@ -80,8 +236,4 @@ class HaloScanDetails(object):
 
     def set_halo_session(self):
         """Authenticate this instance's Halo session."""
-        self.halo_session = HaloGeneral.build_halo_session(self.halo_key,
-                                                           self.halo_secret,
-                                                           self.api_host,
-                                                           self.api_port,
-                                                           self.ua)
+        self.halo_session = self.session_manager.get_session()
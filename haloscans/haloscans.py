@@ -1,11 +1,15 @@
-import cloudpassage
 import datetime
 import threading
 import time
-from collections import deque
+from Queue import Empty, Full, Queue
+from completion_scheduler import CompletionScheduler
 from halo_general import HaloGeneral
 from haloscandetails import HaloScanDetails
+from metrics import MetricsRegistry
 from multiprocessing.dummy import Pool as ThreadPool
+from reorder_buffer import WatermarkBuffer
+from seen_index import SeenIndex
+from session_manager import SessionManager
 from utility import Utility
 
 
@@ -19,12 +23,116 @@ class HaloScans(object):
     Keyword Args:
         api_host (str): Hostname for Halo API.  Default is api.cloudpassage.com
         api_port (str): Port for API endpoint.  Defaults to 443
-        max_threads (int): Max number of open threads.  Defaults to 10.
-        batch_size (int): Limit the depth of the query.  Defaults to 20.
+        max_threads (int): Number of enrichment worker threads.  Defaults to
+            10.
+        fim_threads (int): Number of threads retrieving FIM findings, in one
+            pool shared by all enrichment workers.  Defaults to 20.
+        prefetch_pages (int): Number of /v1/scans pages requested at once
+            while ingestion is catching up.  Once it has caught up, pages
+            are polled one at a time.  Defaults to 4.
+        max_in_flight (int): Max number of concurrent Halo API requests,
+            across ingestion, enrichment, completion polling and FIM
+            findings retrieval.  Defaults to None, for no limit.
+        min_in_flight (int): If set, the limit on concurrent API requests is
+            adjusted at runtime between this and ``max_in_flight``: cut on
+            throttling (or slow responses), raised gradually otherwise.  The
+            current limit is reported in ``metrics``.
+        latency_target (float): API responses slower than this many seconds
+            make the adaptive limit back off.  Defaults to None, so only
+            throttling does.
+        rate_limit (float): Max Halo API requests per second, shared by all
+            stages.  Scan listing requests wait behind enrichment requests.
+            Defaults to None, for no limit.
+        rate_burst (int): Max burst of requests above ``rate_limit``.
+        max_retries (int): Times to retry an API request which is throttled,
+            fails with a 5xx or can't connect, with jittered exponential
+            backoff.  Defaults to 3.
+        batch_size (int): Max number of scans being actively enriched at
+            once.  Scans parked waiting on completion, and finished scans
+            waiting on earlier ones to preserve ordering, don't count.
+            Defaults to 30.
+        reorder_window (int): Max number of scans in flight in the
+            enrichment stage, counting parked and finished-but-unreleased
+            scans.  This bounds how far enrichment may run ahead of the
+            oldest unfinished scan.  Defaults to 1000.
+        max_lag (float): Scans are yielded in ``created_at`` order, so a
+            scan waits on every older scan still being enriched.  If set, a
+            scan which has waited this many seconds is yielded anyway, ahead
+            of the older ones, and counted in
+            ``haloscans_scans_out_of_order_total``.  The checkpoint doesn't
+            advance past an overtaken scan until it's yielded.  Defaults to
+            None, for strict ordering.
         integration_name (str): Name of the tool using this library.
         search_params (dict): Params for event query
         report_performance (bool): Report performance metrics to stdout.
             Defaults to False
+        session_manager (SessionManager): Shared Halo session manager.  If not
+            set, one is built from the other kwargs.
+        session_manager_class (type): Class used to build the session
+            manager, if one isn't given.  Defaults to ``SessionManager``.
+        unprocessed_queue_size (int): Max number of scan IDs waiting for
+            enrichment.  Ingestion blocks while the queue is full.  Defaults
+            to 10000.
+        completed_queue_size (int): Max number of enriched scans waiting to
+            be yielded.  Enrichment blocks while the queue is full.  Defaults
+            to 1000.
+        start_timestamp (str): ISO8601 timestamp to start from.  Defaults to
+            now.
+        end_timestamp (str): ISO8601 timestamp.  If set, the iterator stops
+            once every scan created before this time has been yielded.
+            Defaults to None, to stream forever.
+        checkpoint (FileCheckpoint or SQLiteCheckpoint): Durable record of
+            the last scan consumed.  If it holds a saved position, that
+            overrides ``start_timestamp`` and scans already consumed at the
+            saved timestamp are skipped at ingestion.  A scan is committed
+            when the consumer asks for the next scan, and commits are saved
+            in batches: see ``checkpoint_every``.
+        checkpoint_every (int): Save the checkpoint after this many commits.
+            Defaults to 100.
+        checkpoint_interval (float): Save the checkpoint at least this often
+            while scans are being committed, in seconds.  Defaults to 5.
+            Pending commits are also saved when the iterator stops or is
+            closed.  After a crash, up to ``checkpoint_every`` scans, or
+            ``checkpoint_interval`` seconds' worth, may be yielded again.
+        metadata_only (bool): If True, yield completed scans as they appear
+            in the /v1/scans listing, without retrieving their details.  One
+            API request per page, rather than per scan.  Scans which are
+            still running when listed are still retrieved once complete.
+            Defaults to False.
+        enrich_when (callable): Called with each completed scan's listing
+            metadata.  If it returns False, the scan is yielded as listed,
+            instead of being enriched.  For example,
+            ``lambda scan: scan["module"] == "fim"``.  Defaults to None, to
+            enrich every scan.
+        scan_filter (ScanFilter): If set, only scans matching this filter are
+            yielded.  Scans are filtered on listing metadata before their
+            details are retrieved, and again on their details before FIM
+            findings are retrieved.
+        fields (list): If set, only these top-level fields of each scan are
+            kept, and FIM findings are only retrieved if ``findings`` is
+            listed.  See ``HaloScanDetails``.
+        compact_records (bool): If True, yield read-only ``CompactScan``
+            records instead of dicts.  They share one copy of each repeated
+            string and keep FIM findings in a column-oriented table, which
+            cuts queue memory during backfills.  They behave like dicts;
+            ``to_dict()`` returns a plain copy.  Defaults to False.
+        seen_index (SeenIndex): IDs of scans already ingested.  Scans listed
+            again, by overlapping time windows or at page boundaries, are
+            dropped before they're retrieved.  Share one between instances
+            streaming overlapping windows.  Defaults to a ``SeenIndex`` which
+            remembers an hour of scans.  Set to None to turn this off.
+        cache (ScanCache): Cache of enriched scans.  Scans found here aren't
+            retrieved from the API again, which saves most of the work of
+            replaying a time range.  Defaults to None.
+        aggregator (ScanAggregator): If set, every scan yielded is added to
+            these rollups, which can be read with ``snapshot()`` at any time.
+            Share one between instances for combined rollups.  Defaults to
+            None.
+        tenant (str): If set, every scan yielded gets a ``tenant`` field with
+            this value.  See ``MultiTenantHaloScans``.
+        metrics (MetricsRegistry): Registry for API, queue and enrichment
+            metrics.  If not set, one is created.  Either way, it's available
+            as the ``metrics`` attribute.
 
 
     """
@@ -35,15 +143,55 @@ class HaloScans(object):
         self.init_time = datetime.datetime.now()
         self.api_port = 443
         self.max_threads = 10
+        self.fim_threads = 20
+        self.prefetch_pages = 4
+        self.max_in_flight = None
+        self.min_in_flight = None
+        self.latency_target = None
+        self.rate_limit = None
+        self.rate_burst = None
+        self.max_retries = 3
         self.batch_size = 30
+        self.reorder_window = 1000
+        self.max_lag = None
+        self.active_enrichments = 0
         self.scans_by_module = {}
         self.last_scan_timestamp = None
         self.currently_enriching = 0
+        self.in_flight = threading.Condition()
+        self.enricher_error = None
+        self.reorder_buffer = None
+        self.next_seq = 0
+        self.enrich_pool = None
+        self.scheduler = None
         self.scans_processed = 0
-        self.scans_unprocessed = deque([])
-        self.completed_scans = deque([])
+        self.end_timestamp = None
+        self.ingest_complete = False
+        self.page_size = 100
+        self.poll_interval = 3
+        self.checkpoint = None
+        self.checkpoint_timestamp = None
+        self.checkpoint_ids = []
+        self.checkpoint_every = 100
+        self.checkpoint_interval = 5
+        self.checkpoint_pending = 0
+        self.checkpoint_saved_at = time.time()
+        self.unprocessed_queue_size = 10000
+        self.completed_queue_size = 1000
         self.report_performance = False
+        self.cache = None
+        self.seen_index = SeenIndex()
+        self.aggregator = None
+        self.tenant = None
+        self.scan_filter = None
+        self.fields = None
+        self.metadata_only = False
+        self.compact_records = False
+        self.enrich_when = None
+        self.metrics = None
         self.halo_session = None
+        self.session_manager = None
+        self.session_manager_class = SessionManager
         self.ua = Utility.build_ua("")
         self.scan_timeout = 300
         self.shutdown = False
@@ -51,13 +199,48 @@ class HaloScans(object):
         self.search_params["since"] = Utility.iso8601_now()  # Default to 'now'
         self.kwargs = kwargs
         self.set_attrs_from_kwargs(kwargs)
-        if "start_timestamp" in kwargs:  # Final authority on start time.
+        if "start_timestamp" in kwargs:  # Final authority on start time...
             self.search_params["since"] = kwargs["start_timestamp"]
+        self.resume_from_checkpoint()  # ...unless we have a checkpoint.
         self.search_params["sort_by"] = "created_at.asc"  # Force sort
+        self.scans_unprocessed = Queue(self.unprocessed_queue_size)
+        self.completed_scans = Queue(self.completed_queue_size)
+        if self.metrics is None:
+            self.metrics = MetricsRegistry()
+        self.register_metrics()
+        if self.session_manager is None:
+            self.session_manager = self.build_session_manager()
+        self.enricher = HaloScanDetails(halo_key, halo_secret,
+                                        api_host=self.api_host,
+                                        api_port=self.api_port,
+                                        max_threads=self.fim_threads,
+                                        scan_timeout=self.scan_timeout,
+                                        session_manager=self.session_manager,
+                                        cache=self.cache,
+                                        fields=self.fields,
+                                        compact_records=self.compact_records,
+                                        metrics=self.metrics)
         print("Search params: %s" % self.search_params)
 
+    def build_session_manager(self):
+        """Build a session manager from this object's settings."""
+        # One connection for each ingestion, enrichment and FIM thread.
+        manager_class = self.session_manager_class
+        pool_size = (self.max_threads + self.fim_threads +
+                     self.prefetch_pages)
+        return manager_class(self.halo_key, self.halo_secret,
+                             api_host=self.api_host, api_port=self.api_port,
+                             ua=self.ua, pool_size=pool_size,
+                             max_in_flight=self.max_in_flight,
+                             min_in_flight=self.min_in_flight,
+                             latency_target=self.latency_target,
+                             rate_limit=self.rate_limit,
+                             rate_burst=self.rate_burst,
+                             max_retries=self.max_retries,
+                             metrics=self.metrics)
+
     def __iter__(self):
-        """Yields scans one at a time. Forever.
+        """Yields scans one at a time. Forever, unless end_timestamp is set.
 
         This iterator starts three threads: one for consuming scan metadata
         from the Halo API (/v1/scans endpoint), one for enriching those scans
@@ -69,13 +252,15 @@ class HaloScans(object):
         It may take a couple of minutes to get the first results back from the
         iterator, due to the enricher's need to recursively query the Halo API
         for detailed scan information... so please be patient.
+
+        If ``end_timestamp`` is set and a worker thread dies before every scan
+        in the window has been yielded, this raises ``RuntimeError`` rather
+        than stopping as if the window were complete.
         """
-        self.halo_session = HaloGeneral.build_halo_session(self.halo_key,
-                                                           self.halo_secret,
-                                                           self.api_host,
-                                                           self.api_port,
-                                                           self.ua)
+        self.halo_session = self.session_manager.get_session()
         self.shutdown = False
+        self.ingest_complete = False
+        self.failure = None
         # We configure the ingestion thread
         self.ingest = threading.Thread(target=self.scan_id_preloader)
         self.ingest.daemon = True
@@ -100,8 +285,16 @@ class HaloScans(object):
                 self.enrich = None
                 self.performance = None
                 self.shutdown = False  # Reset, in case we want to re-start
+                self.save_checkpoint()
+                if self.failure is not None and self.end_timestamp is not None:
+                    raise RuntimeError("Incomplete scan stream: %s" %
+                                       self.failure)
                 raise StopIteration
-            elif not self.ingest.is_alive():
+            elif self.stream_drained():
+                print("All scans before %s processed." % self.end_timestamp)
+                self.shutdown = True
+                continue
+            elif not self.ingest.is_alive() and not self.ingest_complete:
                 healthy = False
                 print("Ingestion thread has died!")
             elif not self.enrich.is_alive():
@@ -111,90 +304,513 @@ class HaloScans(object):
                 healthy = False
                 print("Performance monitoring thread has died!")
             if not healthy:  # Gracefully shutdown if unhealthy.
+                self.failure = self.enricher_error or "worker thread died"
                 print("Timestamp from last scan processed: %s" %
                       self.last_scan_timestamp)
                 self.shutdown = True
                 continue
-            # Now, we yield a scan if any are waiting.
+            # Now, we yield a scan as soon as one is waiting.
             try:
-                current_scan = self.completed_scans.popleft()
-                self.last_scan_timestamp = current_scan["created_at"]
-                self.scans_processed += 1
-                self.tally_scan(str(current_scan["module"]))
+                current_scan = self.completed_scans.get(timeout=1)
+                self.count_yielded(current_scan)
                 yield current_scan
-            except IndexError:
-                try:
-                    time.sleep(1)
-                except KeyboardInterrupt:
-                    self.shutdown = True
+                self.commit_checkpoint(current_scan)
+            except Empty:
+                continue
+            except GeneratorExit:  # The consumer closed the iterator.
+                self.save_checkpoint()
+                raise
             except KeyboardInterrupt:
                 self.shutdown = True
 
     def scan_id_preloader(self):
-        """Get scan metadata from /v1/scans endpoint, load ids into queue."""
-        scan_streamer = cloudpassage.TimeSeries(self.halo_session,
-                                                self.search_params["since"],
-                                                "/v1/scans", "scans",
-                                                self.search_params)
-        for scan in scan_streamer:
-            if self.shutdown:
+        """Get scan metadata from /v1/scans endpoint, load it into queue."""
+        resume_ids = set(self.checkpoint_ids)
+        for created, scan in self.paged_scan_stream():
+            if scan["id"] in resume_ids:  # Consumed before the restart.
+                continue
+            if self.duplicate(scan, created):
+                continue
+            if not self.wanted(scan, listing=True):
+                continue
+            if not self.enqueue(self.scans_unprocessed, (created, scan)):
                 break
-            self.scans_unprocessed.append(scan["id"])
+        else:
+            # The bounded stream also ends early if we're shutting down.
+            self.ingest_complete = not self.shutdown
         print("Stopped scan ID preloader thread.")
         return
 
+    def paged_scan_stream(self):
+        """Yield ``(created, scan)`` from ``since``, in ``created_at`` order.
+
+        This is the only place a listed scan's timestamp is parsed.
+        Everything downstream (ordering, deadlines, timeouts) uses the key.
+
+        Up to ``prefetch_pages`` consecutive pages are requested at once,
+        from the ``since`` cursor, and stitched together in order.  While
+        every page comes back full, we're behind, so we keep prefetching.
+        Once a page comes back short, we've caught up.  With
+        ``end_timestamp`` set, that's the end of the stream.  Otherwise we
+        fall back to polling one page at a time, every ``poll_interval``
+        seconds, until a full page shows we're behind again.
+
+        Scans created exactly at ``end_timestamp`` are not included, so
+        adjacent time windows don't overlap.
+        """
+        end = None
+        params = dict(self.search_params)
+        params["per_page"] = self.page_size
+        if self.end_timestamp is not None:
+            end = Utility.iso8601_to_epoch(self.end_timestamp)
+            params["until"] = self.end_timestamp
+        first_page = 1
+        page_count = self.prefetch_pages
+        seen_ids = set([])
+        pool = ThreadPool(self.prefetch_pages)
+        try:
+            while not self.shutdown:
+                pages = self.get_scan_pages(pool, params, first_page,
+                                            page_count)
+                batch = [scan for page in pages for scan in page]
+                new_scans = 0
+                for scan in batch:
+                    if scan["id"] in seen_ids:
+                        continue
+                    created = Utility.iso8601_to_epoch(scan["created_at"])
+                    if end is not None and created >= end:
+                        return
+                    new_scans += 1
+                    yield created, scan
+                caught_up = any(len(page) < self.page_size for page in pages)
+                if caught_up and end is not None:
+                    return
+                if batch:
+                    batch_ids = set([scan["id"] for scan in batch])
+                    if batch[-1]["created_at"] == params["since"]:
+                        # The whole batch shares one timestamp: step past it.
+                        first_page += page_count
+                        seen_ids.update(batch_ids)
+                    else:
+                        params["since"] = batch[-1]["created_at"]
+                        first_page = 1
+                        seen_ids = batch_ids
+                page_count = 1 if caught_up else self.prefetch_pages
+                if caught_up and not new_scans:
+                    self.idle(self.poll_interval)
+        finally:
+            pool.close()
+
+    def get_scan_pages(self, pool, params, first_page, page_count):
+        """Return ``page_count`` pages of /v1/scans results, in order."""
+        urls = Utility.create_url_batch("/v1/scans", page_count, params,
+                                        first_page=first_page)
+        pages = HaloGeneral.get_pages_with_session(self.halo_session,
+                                                   page_count, urls,
+                                                   pool=pool)
+        return [page["scans"] for page in pages]
+
     def scan_enricher(self):
-        """Enrich scans by id from queue."""
-        ids_to_process = []
+        """Feed scans from the queue to a long-lived pool of enrichers.
+
+        Scans which ``needs_details()`` says don't need enriching go straight
+        to the reorder buffer, as listed.  The rest are dispatched to the
+        worker pool as soon as they're queued,
+        as long as fewer than ``batch_size`` scans are being actively
+        enriched, and fewer than ``reorder_window`` are in flight at all
+        (counting scans waiting on completion, or enriched and waiting on an
+        earlier scan).  Results go through a ``WatermarkBuffer``, so they
+        land in ``completed_scans`` in ``created_at`` order: a scan is
+        released once no older scan is still in flight, or after
+        ``max_lag`` seconds.
+
+        Scans which aren't complete yet are parked in a
+        ``CompletionScheduler``, which frees the worker immediately and puts
+        the scan back into the pool once it completes or times out.
+        """
+        self.start_enrichment()
+        self.enrich_pool = ThreadPool(self.max_threads)
+        self.scheduler = CompletionScheduler(self.poll_scan,
+                                             self.poll_complete,
+                                             self.resume_scan)
+        self.scheduler.start()
         while True:
             if self.shutdown:
                 break
-            while (len(self.scans_unprocessed) > 0 and
-                   len(ids_to_process) < self.batch_size):
-                ids_to_process.append(self.scans_unprocessed.popleft())
-            self.completed_scans.extend(self.get_details_from_batch(ids_to_process))  # NOQA
-            ids_to_process = []
-            time.sleep(1)
+            if self.scheduler.error is not None:
+                self.enricher_error = self.scheduler.error
+            if self.enricher_error is not None:
+                self.stop_enrichment()
+                raise self.enricher_error
+            if self.max_lag is not None:
+                self.release_scans(self.reorder_buffer.expire())
+            with self.in_flight:
+                if self.enrichment_saturated():
+                    self.in_flight.wait(1)
+                    continue
+            try:
+                created, listed = self.scans_unprocessed.get(timeout=1)
+            except Empty:
+                continue
+            self.dispatch_scan(created, listed)
+        self.stop_enrichment()
         print("Stopped scan enricher thread.")
         return
 
+    def start_enrichment(self):
+        """Reset enrichment state, before scans are dispatched."""
+        self.enricher_error = None
+        self.next_seq = 0
+        self.reorder_buffer = WatermarkBuffer(
+            self.enqueue_completed, max_lag=self.max_lag,
+            flag_callback=self.scans_out_of_order.inc)
+
+    def dispatch_scan(self, created, listed):
+        """Send one scan from the queue to ``enrich_pool``, or pass it on.
+
+        Args:
+            created (float): The scan's ``created_at``, as epoch seconds.
+            listed (dict): Scan metadata from the /v1/scans listing.
+
+        """
+        with self.in_flight:
+            self.currently_enriching += 1
+            self.active_enrichments += 1
+        self.scans_unprocessed.task_done()
+        key = (created, self.next_seq)
+        self.next_seq += 1
+        self.reorder_buffer.dispatch(key)
+        if self.needs_details(listed):
+            self.enrich_pool.apply_async(self.enrich_scan, (key, listed))
+        else:
+            self.scans_passed_through.inc()
+            self.release_scan(key, self.enricher.project(listed))
+
+    def stop_enrichment(self):
+        """Stop the completion scheduler, and the worker and FIM pools."""
+        self.scheduler.stop()
+        self.enrich_pool.close()
+        self.enrich_pool.join()
+        self.enricher.close()
+
+    def enrichment_saturated(self):
+        """Return True if we can't dispatch another scan yet.
+
+        Hold ``in_flight`` when calling this.
+        """
+        return (self.active_enrichments >= self.batch_size or
+                self.currently_enriching >= self.reorder_window)
+
+    def stream_drained(self):
+        """Return True once ingestion is done and every scan is yielded."""
+        return (self.ingest_complete and
+                self.scans_unprocessed.unfinished_tasks == 0 and
+                self.currently_enriching == 0 and
+                self.completed_scans.empty())
+
+    def enqueue(self, queue, item):
+        """Put ``item`` on a bounded queue, blocking while the queue is full.
+
+        Returns:
+            bool: False if we shut down before the item could be queued.
+
+        """
+        while not self.shutdown:
+            try:
+                queue.put(item, timeout=1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def enqueue_completed(self, scans):
+        """Put scans released by the reorder buffer on the outbound queue."""
+        for scan in scans:
+            if scan is not None:
+                self.enqueue(self.completed_scans, scan)
+
+    def duplicate(self, scan, created):
+        """Return True if this listed scan was already ingested."""
+        if self.seen_index is None:
+            return False
+        if not self.seen_index.seen(scan["id"], created):
+            return False
+        self.scans_deduplicated.inc()
+        return True
+
+    def wanted(self, scan, listing=False):
+        """Return True if the scan passes ``scan_filter``, if we have one.
+
+        Args:
+            scan (dict): Scan details, or metadata if ``listing`` is True.
+            listing (bool): True for metadata from the /v1/scans listing.
+
+        """
+        if self.scan_filter is None:
+            return True
+        if listing:
+            matched = self.scan_filter.matches_listing(scan)
+        else:
+            matched = self.scan_filter.matches(scan)
+        if not matched:
+            self.scans_filtered.inc(stage="listing" if listing else "details")
+        return matched
+
+    def needs_details(self, listed):
+        """Return True if we must retrieve this listed scan's details.
+
+        Scans still running when listed always need details.  Otherwise, we
+        ask ``enrich_when``, if it's set.
+        """
+        if listed.get("status") in HaloScanDetails.incomplete_statuses:
+            return True
+        if self.metadata_only:
+            return False
+        if self.enrich_when is None:
+            return True
+        return self.enrich_when(listed)
+
+    def enrich_scan(self, key, listed):
+        """Get one scan in a worker thread, and finish it or park it.
+
+        Args:
+            key (tuple): ``(created, seq)``: the scan's ``created_at``, as
+                epoch seconds, and its position in the ingested stream.
+            listed (dict): Scan metadata from the /v1/scans listing.
+
+        """
+        created = key[0]
+        scan_id = listed["id"]
+        try:
+            details = self.enricher.get_cached(scan_id)
+            if details is not None:
+                if not self.wanted(details):
+                    details = None
+                self.release_scan(key, details)
+                return
+            details = self.enricher.get_scan(scan_id)
+            if self.done_waiting(details, created):
+                self.finish_scan(key, details)
+            else:
+                self.scheduler.defer((key, time.time()), details,
+                                     self.enricher.deadline(details, created))
+                self.finish_active()
+        except Exception as e:
+            self.enricher_error = e
+
+    def finish_scan(self, key, details):
+        """Finish enriching one scan, then hand it to the reorder buffer.
+
+        Scans the filter rejects go to the reorder buffer as None, so later
+        scans aren't held up waiting for them.
+        """
+        if not self.wanted(details):
+            self.release_scan(key, None)
+            return
+        try:
+            details = self.enricher.finalize(details)
+        except Exception as e:
+            self.enricher_error = e
+            return
+        self.release_scan(key, details)
+
+    def release_scan(self, key, details):
+        """Hand a finished scan to the reorder buffer."""
+        if self.tenant is not None and details is not None:
+            details["tenant"] = self.tenant
+        if self.compact_records and details is not None:
+            details = self.enricher.compact(details)
+        self.release_scans(self.reorder_buffer.add(key, details))
+        self.finish_active()
+
+    def release_scans(self, released):
+        """Note that ``released`` scans have left the enrichment stage."""
+        if released:
+            with self.in_flight:
+                self.currently_enriching -= released
+                self.in_flight.notify()
+
+    def finish_active(self):
+        """Note that a scan no longer occupies an active enrichment slot."""
+        with self.in_flight:
+            self.active_enrichments -= 1
+            self.in_flight.notify()
+
+    def poll_scan(self, scan_body):
+        """Re-query an incomplete scan.  Called by the scheduler."""
+        return self.enricher.get_scan(scan_body["id"])
+
+    def poll_complete(self, scan_body):
+        """Return True if a re-polled scan is complete.
+
+        The scheduler enforces the scan's deadline itself.
+        """
+        return self.enricher.is_complete(scan_body)
+
+    def done_waiting(self, scan_body, created):
+        """Return True if the scan is complete, or we've given up on it."""
+        return (self.enricher.is_complete(scan_body) or
+                self.enricher.timed_out(scan_body, created))
+
+    def resume_scan(self, key, scan_body):
+        """Send a scan we're done waiting on back to the worker pool."""
+        key, parked_at = key
+        if not self.enricher.is_complete(scan_body):
+            self.enricher.timed_out(scan_body, key[0])  # Logs the give-up.
+        self.completion_wait.observe(time.time() - parked_at)
+        with self.in_flight:
+            self.active_enrichments += 1
+        self.enrich_pool.apply_async(self.finish_scan, (key, scan_body))
+
     def performance_reporter(self):
         """Periodically print out performance information."""
-        time.sleep(10)
+        self.idle(10)
         while True:
             if self.shutdown:
                 break
-            uptime = int((datetime.datetime.now() - self.init_time).seconds)
-            scans_per_second = str(self.scans_processed / uptime)
+            uptime = self.uptime()
+            scans_per_second = self.scans_processed / uptime
             perf = "Performance %s:\n" % Utility.iso8601_now()
-            perf += "\tRunning for %s seconds\n" % uptime
+            perf += "\tRunning for %d seconds\n" % uptime
             perf += "\tTotal processed: %d\n" % int(self.scans_processed)
             perf += "\tBy module:\n\t\t%s\n" % self.get_scan_counts_by_module()
-            perf += "\tScans per second: %s\n" % scans_per_second
-            perf += "\tAwaiting enrichment: %s\n" % len(self.scans_unprocessed)
+            perf += "\tScans per second: %.2f\n" % scans_per_second
+            perf += ("\tAwaiting enrichment: %s\n" %
+                     self.scans_unprocessed.qsize())
             perf += "\tEnriching now: %d\n" % int(self.currently_enriching)
-            perf += "\tOutbound: %s\n" % len(self.completed_scans)
+            perf += "\tAwaiting completion: %d\n" % self.awaiting_completion()
+            perf += "\tOutbound: %s\n" % self.completed_scans.qsize()
             if self.report_performance:
                 print(perf)
-            time.sleep(60)
+            self.idle(60)
         print("Stopped performance reporter thread.")
         return
 
-    def get_details_from_batch(self, id_list):
-        """Gets detailed scan information from batch of scans."""
-        self.currently_enriching = len(id_list)
-        enricher = HaloScanDetails(self.halo_key, self.halo_secret,
-                                   api_host=self.api_host,
-                                   api_port=self.api_port,
-                                   scan_timeout=self.scan_timeout)
-        enricher.set_halo_session()
-        pool = ThreadPool(self.max_threads)
-        results = pool.map(enricher.get, id_list)
-        pool.close()
-        pool.join()
-        self.currently_enriching = 0
-        retval = Utility.order_items(results, "created_at")
-        return retval
+    def register_metrics(self):
+        """Create our metrics, including gauges computed when read."""
+        self.scans_total = self.metrics.counter(
+            "haloscans_scans_total", "Scans yielded.", labelnames=["module"])
+        self.scans_passed_through = self.metrics.counter(
+            "haloscans_scans_passed_through_total",
+            "Scans yielded from listing metadata, without enrichment.")
+        self.scans_filtered = self.metrics.counter(
+            "haloscans_scans_filtered_total",
+            "Scans dropped by the scan filter.", labelnames=["stage"])
+        self.scans_deduplicated = self.metrics.counter(
+            "haloscans_scans_deduplicated_total",
+            "Listed scans dropped because they were already ingested.")
+        self.scans_out_of_order = self.metrics.counter(
+            "haloscans_scans_out_of_order_total",
+            "Scans yielded ahead of an older scan, after max_lag.")
+        self.completion_wait = self.metrics.histogram(
+            "haloscans_completion_wait_seconds",
+            "Time incomplete scans spend waiting to complete.")
+        gauges = [("haloscans_uptime_seconds", "Seconds since start.",
+                   self.uptime),
+                  ("haloscans_unprocessed_queue_depth",
+                   "Scan IDs waiting for enrichment.",
+                   self.scans_unprocessed.qsize),
+                  ("haloscans_currently_enriching",
+                   "Scans in flight in the enrichment stage.",
+                   lambda: self.currently_enriching),
+                  ("haloscans_active_enrichments",
+                   "Scans being actively enriched.",
+                   lambda: self.active_enrichments),
+                  ("haloscans_awaiting_completion",
+                   "Incomplete scans waiting to be re-polled.",
+                   self.awaiting_completion),
+                  ("haloscans_completed_queue_depth",
+                   "Enriched scans waiting to be yielded.",
+                   self.completed_scans.qsize),
+                  ("haloscans_enrichment_lag_seconds",
+                   "Age of the most recently yielded scan.",
+                   self.enrichment_lag)]
+        for name, help_text, function in gauges:
+            self.metrics.gauge(name, help_text).set_function(function)
+
+    def count_yielded(self, scan):
+        """Update counters for a scan about to be yielded."""
+        self.last_scan_timestamp = scan["created_at"]
+        self.scans_processed += 1
+        self.tally_scan(str(scan["module"]))
+        self.scans_total.inc(module=scan["module"])
+        if self.aggregator is not None:
+            self.aggregator.add(scan)
+
+    def uptime(self):
+        """Seconds since this object was created."""
+        return (datetime.datetime.now() - self.init_time).total_seconds()
+
+    def awaiting_completion(self):
+        """Number of incomplete scans parked in the completion scheduler."""
+        if self.scheduler is None:
+            return 0
+        return len(self.scheduler)
+
+    def enrichment_lag(self):
+        """Seconds since the created_at of the last scan yielded."""
+        if self.last_scan_timestamp is None:
+            return 0
+        last_scan = Utility.iso8601_to_epoch(self.last_scan_timestamp)
+        return time.time() - last_scan
+
+    def idle(self, seconds):
+        """Sleep up to ``seconds``, waking early if we're shutting down."""
+        for _ in range(seconds):
+            if self.shutdown:
+                return
+            time.sleep(1)
+
+    def resume_from_checkpoint(self):
+        """Start from the checkpoint's position, if one was saved."""
+        if self.checkpoint is None:
+            return
+        state = self.checkpoint.load()
+        if state is None:
+            return
+        self.search_params["since"] = state["created_at"]
+        self.last_scan_timestamp = state["created_at"]
+        self.checkpoint_timestamp = state["created_at"]
+        self.checkpoint_ids = list(state["ids"])
+
+    def commit_checkpoint(self, scan):
+        """Record ``scan`` as consumed, in the checkpoint."""
+        if self.checkpoint is None:
+            return
+        held = self.checkpoint_hold()
+        if held is not None:
+            # An older scan was overtaken and isn't yielded yet, so we'll
+            # resume from that one.  Later scans may be yielded again.
+            if held != self.checkpoint_timestamp:
+                self.checkpoint_timestamp = held
+                self.checkpoint_ids = []
+        else:
+            if scan["created_at"] != self.checkpoint_timestamp:
+                self.checkpoint_timestamp = scan["created_at"]
+                self.checkpoint_ids = []
+            self.checkpoint_ids.append(scan["id"])
+        self.checkpoint_pending += 1
+        overdue = (time.time() - self.checkpoint_saved_at >=
+                   self.checkpoint_interval)
+        if self.checkpoint_pending >= self.checkpoint_every or overdue:
+            self.save_checkpoint()
+
+    def checkpoint_hold(self):
+        """Return the timestamp of the oldest overtaken scan, or None."""
+        if self.reorder_buffer is None:
+            return None
+        overtaken = self.reorder_buffer.overtaken()
+        if overtaken is None:
+            return None
+        return Utility.epoch_to_iso8601(overtaken[0])
+
+    def save_checkpoint(self):
+        """Save commits not yet written to the checkpoint."""
+        if self.checkpoint is None or not self.checkpoint_pending:
+            return
+        self.checkpoint.save(self.checkpoint_timestamp, self.checkpoint_ids)
+        self.checkpoint_pending = 0
+        self.checkpoint_saved_at = time.time()
 
     def get_scan_counts_by_module(self):
         ret_lst = []
@@ -210,8 +826,17 @@ class HaloScans(object):
         return
 
     def set_attrs_from_kwargs(self, kwargs):
-        arg_list = ["max_threads", "batch_size", "report_performance",
-                    "search_params", "api_host", "api_port", "scan_timeout"]
+        arg_list = ["max_threads", "fim_threads", "prefetch_pages",
+                    "max_in_flight", "min_in_flight", "latency_target",
+                    "rate_limit", "rate_burst", "max_retries", "batch_size",
+                    "reorder_window", "max_lag", "report_performance",
+                    "search_params", "api_host", "api_port", "scan_timeout",
+                    "session_manager", "session_manager_class",
+                    "unprocessed_queue_size", "completed_queue_size",
+                    "checkpoint", "checkpoint_every", "checkpoint_interval",
+                    "end_timestamp", "cache", "scan_filter", "fields",
+                    "metadata_only", "enrich_when", "compact_records",
+                    "seen_index", "aggregator", "tenant", "metrics"]
         for arg in arg_list:
             if arg in kwargs:
                 setattr(self, arg, kwargs[arg])
@@ -0,0 +1,194 @@
+import bisect
+import threading
+
+
+class Metric(object):
+    """Base class for metrics, which may be broken down by labels.
+
+    Args:
+        name (str): Metric name, in Prometheus style.
+        help_text (str): Description of the metric.
+
+    Keyword Args:
+        labelnames (list): Names of labels for this metric.
+
+    """
+    metric_type = "untyped"
+
+    def __init__(self, name, help_text, **kwargs):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(kwargs.get("labelnames", ()))
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def label_key(self, labels):
+        """Return the tuple of label values for a dict of labels."""
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def label_string(self, key, extra=()):
+        """Return a Prometheus label string for a tuple of label values."""
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{%s}" % ",".join('%s="%s"' % (name, value)
+                                 for name, value in pairs)
+
+    def samples(self):
+        """Return a list of (suffix, label string, value) tuples."""
+        with self.lock:
+            items = sorted(self.values.items())
+        return [("", self.label_string(key), value) for key, value in items]
+
+    def snapshot(self):
+        """Return current values, keyed by label values (or None)."""
+        with self.lock:
+            items = list(self.values.items())
+        if not self.labelnames:
+            return dict(items).get((), 0)
+        return dict(("|".join(key), value) for key, value in items)
+
+
+class Counter(Metric):
+    """A value which only ever goes up."""
+    metric_type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value which can go up and down.
+
+    A gauge can be given a function with ``set_function()``, in which case
+    its value is computed every time the gauge is read.
+    """
+    metric_type = "gauge"
+
+    def __init__(self, name, help_text, **kwargs):
+        super(Gauge, self).__init__(name, help_text, **kwargs)
+        self.function = None
+
+    def set(self, value, **labels):
+        key = self.label_key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def set_function(self, function):
+        """Compute this (unlabelled) gauge by calling ``function``."""
+        self.function = function
+
+    def samples(self):
+        if self.function is not None:
+            return [("", "", self.function())]
+        return super(Gauge, self).samples()
+
+    def snapshot(self):
+        if self.function is not None:
+            return self.function()
+        return super(Gauge, self).snapshot()
+
+
+class Histogram(Metric):
+    """Distribution of observed values, counted in cumulative buckets.
+
+    Keyword Args:
+        buckets (list): Upper bounds of buckets, ascending.  Defaults to
+            ``default_buckets``, which suit request latencies in seconds.
+
+    """
+    metric_type = "histogram"
+    default_buckets = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                       10, 30, 60, 120, 300]
+
+    def __init__(self, name, help_text, **kwargs):
+        super(Histogram, self).__init__(name, help_text, **kwargs)
+        self.buckets = list(kwargs.get("buckets", self.default_buckets))
+
+    def observe(self, value, **labels):
+        key = self.label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = {"counts": [0] * (len(self.buckets) + 1),
+                                    "sum": 0.0, "count": 0}
+            state = self.values[key]
+            state["counts"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def samples(self):
+        with self.lock:
+            items = sorted((key, dict(state, counts=list(state["counts"])))
+                           for key, state in self.values.items())
+        results = []
+        for key, state in items:
+            cumulative = 0
+            bounds = self.buckets + ["+Inf"]
+            for bound, count in zip(bounds, state["counts"]):
+                cumulative += count
+                results.append(("_bucket",
+                                self.label_string(key, [("le", bound)]),
+                                cumulative))
+            results.append(("_sum", self.label_string(key), state["sum"]))
+            results.append(("_count", self.label_string(key), state["count"]))
+        return results
+
+    def snapshot(self):
+        with self.lock:
+            items = [(key, {"count": state["count"], "sum": state["sum"]})
+                     for key, state in self.values.items()]
+        if not self.labelnames:
+            return dict(items).get((), {"count": 0, "sum": 0.0})
+        return dict(("|".join(key), value) for key, value in items)
+
+
+class MetricsRegistry(object):
+    """Collection of named metrics, readable as a dict or Prometheus text.
+
+    Metrics are created on first use, and the same object is returned for
+    the same name after that.
+    """
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def counter(self, name, help_text, **kwargs):
+        return self.get_or_create(Counter, name, help_text, **kwargs)
+
+    def gauge(self, name, help_text, **kwargs):
+        return self.get_or_create(Gauge, name, help_text, **kwargs)
+
+    def histogram(self, name, help_text, **kwargs):
+        return self.get_or_create(Histogram, name, help_text, **kwargs)
+
+    def get_or_create(self, metric_class, name, help_text, **kwargs):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = metric_class(name, help_text, **kwargs)
+            return self.metrics[name]
+
+    def snapshot(self):
+        """Return the current value of every metric, keyed by metric name.
+
+        Labelled metrics map ``|``-joined label values to values.  Histograms
+        report ``count`` and ``sum``.
+        """
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return dict((metric.name, metric.snapshot()) for metric in metrics)
+
+    def to_prometheus(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append("# HELP %s %s" % (metric.name, metric.help_text))
+            lines.append("# TYPE %s %s" % (metric.name, metric.metric_type))
+            for suffix, labels, value in metric.samples():
+                lines.append("%s%s%s %s" % (metric.name, suffix, labels,
+                                            value))
+        return "\n".join(lines) + "\n"
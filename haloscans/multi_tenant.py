@@ -0,0 +1,251 @@
+import threading
+import time
+from Queue import Empty
+from completion_scheduler import SharedCompletionScheduler
+from haloscans import HaloScans
+from multiprocessing.dummy import Pool as ThreadPool
+
+
+class MultiTenantHaloScans(object):
+    """Stream scans from several Halo accounts, sharing one set of workers.
+
+    Each tenant (Halo account) gets its own ``HaloScans``, available in
+    ``tenants`` by name.  That has its own session manager (and so its own
+    API rate and concurrency limits), ingestion thread, filter, checkpoint,
+    metrics and ordering.  Enrichment is shared: one enrichment thread, one
+    worker pool, one FIM findings pool and one completion scheduler serve
+    every tenant.  So adding a tenant adds one ingestion thread, rather than
+    a full set of threads and pools.
+
+    Tenants take turns dispatching queued scans to the worker pool, one scan
+    per turn, so a tenant with a big backlog can't starve the others.  At
+    most ``batch_size`` scans are actively enriched at once in total, and at
+    most ``tenant_batch_size`` for any one tenant.
+
+    Each tenant's scans are yielded in ``created_at`` order, interleaved
+    with other tenants' scans, and every scan has a ``tenant`` field with
+    the tenant's name.
+
+    Args:
+        tenants (list): One dict per Halo account, with ``name``,
+            ``halo_key`` and ``halo_secret``.  Any other items are kwargs for
+            that tenant's ``HaloScans``, like ``checkpoint`` or
+            ``scan_filter``.
+
+    Keyword Args:
+        max_threads (int): Number of enrichment worker threads, shared by
+            all tenants.  Defaults to 10.
+        fim_threads (int): Number of FIM findings threads, shared by all
+            tenants.  Defaults to 20.
+        batch_size (int): Max number of scans being actively enriched at
+            once, across all tenants.  Defaults to 30.
+        tenant_batch_size (int): Max number of one tenant's scans being
+            actively enriched at once.  Defaults to 10.
+
+    Other kwargs, like ``start_timestamp``, ``end_timestamp`` or
+    ``rate_limit``, are passed to every tenant's ``HaloScans``.  Each tenant
+    has its own ``metrics`` registry, so ``metrics`` can't be shared.
+
+    """
+    def __init__(self, tenants, **kwargs):
+        self.max_threads = kwargs.pop("max_threads", 10)
+        self.fim_threads = kwargs.pop("fim_threads", 20)
+        self.batch_size = kwargs.pop("batch_size", 30)
+        self.tenant_batch_size = kwargs.pop("tenant_batch_size", 10)
+        if "metrics" in kwargs:
+            raise ValueError("metrics can't be shared between tenants")
+        self.end_timestamp = kwargs.get("end_timestamp")
+        self.in_flight = threading.Condition()
+        self.shutdown = False
+        self.failure = None
+        self.enricher_error = None
+        self.enrich = None
+        self.turn = 0
+        self.tenants = {}
+        self.streams = []
+        for tenant in tenants:
+            stream = self.build_stream(tenant, kwargs)
+            self.tenants[tenant["name"]] = stream
+            self.streams.append(stream)
+
+    def build_stream(self, tenant, kwargs):
+        """Build one tenant's ``HaloScans``."""
+        tenant_kwargs = dict(kwargs)
+        tenant_kwargs.update((key, value) for key, value in tenant.items()
+                             if key not in ["name", "halo_key",
+                                            "halo_secret"])
+        tenant_kwargs.update({"tenant": tenant["name"],
+                              "max_threads": self.max_threads,
+                              "fim_threads": self.fim_threads,
+                              "batch_size": self.tenant_batch_size})
+        stream = HaloScans(tenant["halo_key"], tenant["halo_secret"],
+                           **tenant_kwargs)
+        stream.in_flight = self.in_flight
+        return stream
+
+    def __iter__(self):
+        """Yield scans from every tenant.  Forever, unless end_timestamp is
+        set.
+
+        Like ``HaloScans``, this raises ``RuntimeError`` if ``end_timestamp``
+        is set and a worker thread dies before every scan in the window has
+        been yielded.
+        """
+        self.shutdown = False
+        self.failure = None
+        for stream in self.streams:
+            stream.halo_session = stream.session_manager.get_session()
+            stream.shutdown = False
+            stream.ingest_complete = False
+            stream.failure = None
+            stream.ingest = threading.Thread(target=stream.scan_id_preloader)
+            stream.ingest.daemon = True
+        self.enrich = threading.Thread(target=self.scan_enricher)
+        self.enrich.daemon = True
+        for stream in self.streams:
+            stream.ingest.start()
+        self.enrich.start()
+        while True:
+            if self.shutdown:
+                self.stop()
+                if self.failure is not None and self.end_timestamp is not None:
+                    raise RuntimeError("Incomplete scan stream: %s" %
+                                       self.failure)
+                raise StopIteration
+            if all(stream.stream_drained() for stream in self.streams):
+                print("All tenants' scans before %s processed." %
+                      self.end_timestamp)
+                self.shutdown = True
+                continue
+            failure = self.check_health()
+            if failure is not None:
+                self.failure = failure
+                self.shutdown = True
+                continue
+            stream, scan = self.next_completed()
+            if scan is None:
+                time.sleep(0.05)
+                continue
+            stream.count_yielded(scan)
+            try:
+                yield scan
+            except GeneratorExit:  # The consumer closed the iterator.
+                self.shutdown = True
+                self.stop()
+                raise
+            stream.commit_checkpoint(scan)
+
+    def check_health(self):
+        """Return a description of the first failed thread, or None."""
+        if not self.enrich.is_alive():
+            print("Enrichment thread has died!")
+            return self.enricher_error or "enrichment thread died"
+        for stream in self.streams:
+            if not stream.ingest.is_alive() and not stream.ingest_complete:
+                print("Ingestion thread for %s has died!" % stream.tenant)
+                return "ingestion thread died for %s" % stream.tenant
+        return None
+
+    def next_completed(self):
+        """Return ``(stream, scan)`` for the next tenant with a scan ready.
+
+        Tenants take turns, so one tenant's output can't hold up another's.
+        Returns ``(None, None)`` if no scans are ready.
+        """
+        count = len(self.streams)
+        for offset in range(count):
+            stream = self.streams[(self.turn + offset) % count]
+            try:
+                scan = stream.completed_scans.get_nowait()
+            except Empty:
+                continue
+            self.turn = (self.turn + offset + 1) % count
+            return stream, scan
+        return None, None
+
+    def stop(self):
+        """Stop every thread, and save every tenant's checkpoint."""
+        print("Stopping threads...")
+        for stream in self.streams:
+            stream.shutdown = True
+        for stream in self.streams:
+            stream.ingest.join(20)
+            stream.save_checkpoint()
+        self.enrich.join(20)
+
+    def scan_enricher(self):
+        """Dispatch every tenant's scans to one shared pool of enrichers.
+
+        Each pass offers the next tenant in turn the chance to dispatch one
+        scan.  A tenant is skipped while it has ``tenant_batch_size`` scans
+        being actively enriched (or ``reorder_window`` in flight), and no
+        tenant may dispatch while ``batch_size`` scans are active in total.
+        """
+        enrich_pool = ThreadPool(self.max_threads)
+        findings_pool = ThreadPool(self.fim_threads)
+        scheduler = SharedCompletionScheduler()
+        for stream in self.streams:
+            stream.start_enrichment()
+            stream.enrich_pool = enrich_pool
+            stream.scheduler = scheduler.view(stream)
+            stream.enricher.findings_pool = findings_pool
+        scheduler.start()
+        turn = 0
+        try:
+            while not self.shutdown:
+                error = scheduler.error
+                for stream in self.streams:
+                    error = error or stream.enricher_error
+                    if stream.max_lag is not None:
+                        stream.release_scans(stream.reorder_buffer.expire())
+                if error is not None:
+                    self.enricher_error = error
+                    raise error
+                with self.in_flight:
+                    if self.active_enrichments() >= self.batch_size:
+                        self.in_flight.wait(1)
+                        continue
+                dispatched = self.dispatch_next(turn)
+                if dispatched is None:
+                    with self.in_flight:
+                        self.in_flight.wait(0.05)
+                else:
+                    turn = dispatched + 1
+        finally:
+            scheduler.stop()
+            enrich_pool.close()
+            enrich_pool.join()
+            findings_pool.close()
+            for stream in self.streams:
+                stream.enricher.findings_pool = None
+        print("Stopped scan enricher thread.")
+
+    def dispatch_next(self, turn):
+        """Dispatch one scan from the first tenant, from ``turn`` on, which
+        has one queued and room for it.
+
+        Returns:
+            int: Index of the tenant which dispatched a scan, or None.
+
+        """
+        count = len(self.streams)
+        for offset in range(count):
+            index = (turn + offset) % count
+            stream = self.streams[index]
+            with self.in_flight:
+                if stream.enrichment_saturated():
+                    continue
+            try:
+                created, listed = stream.scans_unprocessed.get_nowait()
+            except Empty:
+                continue
+            stream.dispatch_scan(created, listed)
+            return index
+        return None
+
+    def active_enrichments(self):
+        """Scans being actively enriched, across all tenants.
+
+        Hold ``in_flight`` when calling this.
+        """
+        return sum(stream.active_enrichments for stream in self.streams)
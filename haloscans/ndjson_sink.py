@@ -0,0 +1,174 @@
+import datetime
+import gzip
+import json
+import os
+import threading
+import time
+from Queue import Empty, Full, Queue
+from utility import Utility
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class NDJSONSink(object):
+    """Write scans to NDJSON files from a background thread.
+
+    ``write()`` only queues the scan.  A writer thread encodes queued scans in
+    batches and writes each batch with one call, optionally through gzip or
+    zstd streaming compression.  Files are rotated once they've taken
+    ``rotate_bytes`` of (uncompressed) NDJSON, or been open for
+    ``rotate_seconds``.  Each file is written as ``<name>.part`` and renamed
+    when it's complete, so anything without the suffix is safe to pick up.
+
+    Args:
+        directory (str): Directory for output files.
+
+    Keyword Args:
+        prefix (str): Output file name prefix.  Defaults to ``scans``.
+        compression (str): ``gzip``, ``zstd`` or None.  ``zstd`` needs the
+            ``zstandard`` package.  Defaults to None.
+        rotate_bytes (int): Rotate after this many bytes of NDJSON.
+            Defaults to 100 MiB.
+        rotate_seconds (float): Rotate files this old.  Defaults to None, for
+            no time-based rotation.
+        batch_size (int): Max scans encoded and written at once.  Defaults
+            to 500.
+        queue_size (int): Max scans waiting to be written.  ``write()``
+            blocks while the queue is full.  Defaults to 10000.
+
+    """
+    extensions = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+    def __init__(self, directory, **kwargs):
+        self.directory = directory
+        self.prefix = kwargs.get("prefix", "scans")
+        self.compression = kwargs.get("compression")
+        self.rotate_bytes = kwargs.get("rotate_bytes", 100 * 1024 * 1024)
+        self.rotate_seconds = kwargs.get("rotate_seconds")
+        self.batch_size = kwargs.get("batch_size", 500)
+        if self.compression not in self.extensions:
+            raise ValueError("Unsupported compression: %s" % self.compression)
+        if self.compression == "zstd" and zstandard is None:
+            raise ValueError("zstd compression requires zstandard")
+        self.queue = Queue(kwargs.get("queue_size", 10000))
+        self.files = []
+        self.file_count = 0
+        self.current = None
+        self.error = None
+        self.closed = False
+        self.writer = threading.Thread(target=self.run)
+        self.writer.daemon = True
+        self.writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, scan):
+        """Queue one scan to be written, blocking while the queue is full."""
+        while True:
+            if self.error is not None:
+                raise self.error
+            try:
+                self.queue.put(scan, timeout=1)
+                return
+            except Full:
+                continue
+
+    def consume(self, scans):
+        """Write every scan from an iterable, like ``HaloScans``.
+
+        Returns:
+            int: Number of scans written.
+
+        """
+        count = 0
+        for scan in scans:
+            self.write(scan)
+            count += 1
+        return count
+
+    def close(self):
+        """Write everything queued, close the current file and stop."""
+        if not self.closed:
+            self.closed = True
+            self.writer.join()
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        """Writer thread: encode and write batches of queued scans."""
+        try:
+            while not (self.closed and self.queue.empty()):
+                batch = self.next_batch()
+                if batch:
+                    self.write_batch(batch)
+                elif self.current is not None and self.file_expired():
+                    self.finish_file()
+            if self.current is not None:
+                self.finish_file()
+        except Exception as e:
+            self.error = e
+
+    def next_batch(self):
+        """Return up to ``batch_size`` queued scans, waiting briefly."""
+        try:
+            batch = [self.queue.get(timeout=0.1)]
+        except Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except Empty:
+                break
+        return batch
+
+    def write_batch(self, batch):
+        """Encode a batch of scans and write it to the current file."""
+        payload = "".join([json.dumps(scan, default=Utility.json_default) +
+                           "\n" for scan in batch])
+        if self.current is not None and self.file_expired():
+            self.finish_file()
+        if self.current is None:
+            self.start_file()
+        self.current["stream"].write(payload)
+        self.current["bytes"] += len(payload)
+
+    def file_expired(self):
+        """Return True if the current file is due for rotation."""
+        if self.current["bytes"] >= self.rotate_bytes:
+            return True
+        if self.rotate_seconds is None:
+            return False
+        return time.time() - self.current["opened"] >= self.rotate_seconds
+
+    def start_file(self):
+        """Open the next output file."""
+        stamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        name = "%s-%s-%06d.ndjson%s" % (self.prefix, stamp, self.file_count,
+                                        self.extensions[self.compression])
+        path = os.path.join(self.directory, name)
+        raw = open(path + ".part", "wb")
+        if self.compression == "gzip":
+            stream = gzip.GzipFile(fileobj=raw, mode="wb")
+        elif self.compression == "zstd":
+            stream = zstandard.ZstdCompressor().stream_writer(raw)
+        else:
+            stream = raw
+        self.file_count += 1
+        self.current = {"path": path, "raw": raw, "stream": stream,
+                        "bytes": 0, "opened": time.time()}
+
+    def finish_file(self):
+        """Close the current file, and give it its final name."""
+        current = self.current
+        current["stream"].close()
+        if not current["raw"].closed:
+            current["raw"].close()
+        os.rename(current["path"] + ".part", current["path"])
+        self.files.append(current["path"])
+        self.current = None
@@ -0,0 +1,64 @@
+import threading
+import time
+
+
+class TokenBucketRateLimiter(object):
+    """Limit the rate of requests, serving higher priorities first.
+
+    Tokens accrue at ``rate`` per second, up to ``burst``.  Each request
+    takes one token, waiting for one if necessary.  While callers of
+    different priorities are waiting, tokens go to the most urgent (lowest
+    numbered) priority first, so a backlog of low-priority requests can't
+    starve high-priority ones.
+
+    Args:
+        rate (float): Requests per second.
+
+    Keyword Args:
+        burst (int): Max number of tokens which may accrue, and so the max
+            burst of requests.  Defaults to ``rate``, or 1 if that's lower.
+
+    """
+    def __init__(self, rate, **kwargs):
+        self.rate = float(rate)
+        self.burst = kwargs.get("burst", max(1, int(rate)))
+        self.tokens = float(self.burst)
+        self.updated = time.time()
+        self.waiting = {}
+        self.cond = threading.Condition()
+
+    def acquire(self, priority=0):
+        """Take a token, waiting until one is available to this priority.
+
+        Args:
+            priority (int): Lower numbers are served first.  Defaults to 0.
+
+        Returns:
+            float: Seconds spent waiting.
+
+        """
+        started = time.time()
+        with self.cond:
+            self.waiting[priority] = self.waiting.get(priority, 0) + 1
+            try:
+                while True:
+                    self.refill()
+                    if self.tokens >= 1 and not self.outranked(priority):
+                        self.tokens -= 1
+                        return time.time() - started
+                    self.cond.wait(max(1 - self.tokens, 0.1) / self.rate)
+            finally:
+                self.waiting[priority] -= 1
+                self.cond.notify_all()
+
+    def refill(self):
+        """Add the tokens accrued since the last refill."""
+        now = time.time()
+        accrued = (now - self.updated) * self.rate
+        self.tokens = min(self.burst, self.tokens + accrued)
+        self.updated = now
+
+    def outranked(self, priority):
+        """Return True if a more urgent caller is waiting."""
+        return any(count for other, count in self.waiting.items()
+                   if other < priority)
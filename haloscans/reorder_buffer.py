@@ -0,0 +1,154 @@
+import heapq
+import threading
+import time
+
+
+class ReorderBuffer(object):
+    """Release items in sequence order, no matter when they finish.
+
+    Each item is added with the sequence number it was assigned when it was
+    dispatched.  Items are handed to ``release_callback`` strictly in sequence
+    order, as soon as every item before them has been added.
+
+    Args:
+        release_callback (callable): Called with a list of items, in order,
+            each time a contiguous run of items becomes releasable.  This is
+            called while holding the buffer's lock, so releases never
+            interleave.
+
+    """
+    def __init__(self, release_callback):
+        self.release_callback = release_callback
+        self.next_seq = 0
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, seq, item):
+        """Buffer ``item`` and release all items which are now in order.
+
+        Returns:
+            int: Number of items released by this call.
+
+        """
+        with self.lock:
+            self.pending[seq] = item
+            ready = []
+            while self.next_seq in self.pending:
+                ready.append(self.pending.pop(self.next_seq))
+                self.next_seq += 1
+            if ready:
+                self.release_callback(ready)
+        return len(ready)
+
+
+class WatermarkBuffer(object):
+    """Release items in key order, once no older item is unfinished.
+
+    Each item is registered with ``dispatch()`` when work on it starts, and
+    handed back with ``add()`` when it's done.  Keys are ``(created, seq)``
+    tuples, so items are ordered by creation time, then by the order they
+    were dispatched.  Finished items wait in a heap.  The oldest unfinished
+    key is the watermark, and finished items older than the watermark are
+    released in key order.
+
+    With ``max_lag`` set, a finished item which has waited that many seconds
+    is released anyway, ahead of older unfinished items.  Those items are
+    then overtaken (see ``overtaken()``) until they finish, and each item
+    released early is reported to ``flag_callback``.  Without ``max_lag``,
+    output is strictly ordered, however long that takes.
+
+    Args:
+        release_callback (callable): Called with a list of items, in order,
+            each time items become releasable.  This is called while holding
+            the buffer's lock, so releases never interleave.
+
+    Keyword Args:
+        max_lag (float): Max seconds a finished item waits on older ones.
+            Defaults to None, for no limit.
+        flag_callback (callable): Called with the number of (non-None) items
+            released ahead of the watermark.
+
+    """
+    def __init__(self, release_callback, **kwargs):
+        self.release_callback = release_callback
+        self.max_lag = kwargs.get("max_lag")
+        self.flag_callback = kwargs.get("flag_callback")
+        self.unfinished = set([])
+        self.unfinished_heap = []
+        self.finished = []
+        self.newest_released = None
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.finished)
+
+    def dispatch(self, key):
+        """Register an unfinished item."""
+        with self.lock:
+            self.unfinished.add(key)
+            heapq.heappush(self.unfinished_heap, key)
+
+    def add(self, key, item):
+        """Finish ``item`` and release all items which are now releasable.
+
+        Returns:
+            int: Number of items released by this call.
+
+        """
+        with self.lock:
+            self.unfinished.discard(key)
+            heapq.heappush(self.finished, (key, time.time(), item))
+            return self.release()
+
+    def expire(self):
+        """Release items which have waited ``max_lag`` seconds.
+
+        Returns:
+            int: Number of items released by this call.
+
+        """
+        with self.lock:
+            return self.release()
+
+    def overtaken(self):
+        """Return the oldest unfinished key which newer items were released
+        ahead of, or None if output is still in order.
+        """
+        with self.lock:
+            watermark = self.watermark()
+            if watermark is None or self.newest_released is None:
+                return None
+            return watermark if watermark < self.newest_released else None
+
+    def watermark(self):
+        """Return the oldest unfinished key, or None.  Hold the lock."""
+        heap = self.unfinished_heap
+        while heap and heap[0] not in self.unfinished:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+    def release(self):
+        """Release finished items up to the watermark.  Hold the lock."""
+        ready = []
+        early = 0
+        now = time.time()
+        watermark = self.watermark()
+        while self.finished:
+            key, finished_at, item = self.finished[0]
+            if watermark is not None and key > watermark:
+                if self.max_lag is None or now - finished_at < self.max_lag:
+                    break
+                if item is not None:
+                    early += 1
+            heapq.heappop(self.finished)
+            ready.append(item)
+            if self.newest_released is None or key > self.newest_released:
+                self.newest_released = key
+        if ready:
+            self.release_callback(ready)
+        if early and self.flag_callback is not None:
+            self.flag_callback(early)
+        return len(ready)
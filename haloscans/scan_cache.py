@@ -0,0 +1,125 @@
+import json
+import sqlite3
+import threading
+import zlib
+from utility import Utility
+
+
+class ScanCache(object):
+    """Keep enriched scan documents in a SQLite database, keyed by scan ID.
+
+    Scans don't change once they're complete, so a cached document can be
+    used in place of the scan details and FIM findings requests which built
+    it.  Documents are stored as compressed JSON.  Once the cache holds more
+    than ``max_entries`` scans or ``max_bytes`` of compressed documents, the
+    least recently used are evicted.
+
+    Cache hits don't write to the database.  Their recency is noted in
+    memory and written with the next ``put()``, or by ``flush()``.  The
+    database uses write-ahead logging, so readers don't wait on writers.
+
+    Only store scans in a terminal status.  ``HaloScanDetails`` takes care of
+    that.
+
+    Args:
+        path (str): Path to SQLite database file.
+
+    Keyword Args:
+        max_entries (int): Max number of scans to keep.  Defaults to 100000.
+        max_bytes (int): Max total size of stored (compressed) documents.
+            Defaults to 1 GiB.
+
+    """
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self.max_entries = kwargs.get("max_entries", 100000)
+        self.max_bytes = kwargs.get("max_bytes", 1 << 30)
+        self.lock = threading.Lock()
+        self.touched = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS scans "
+                              "(id TEXT PRIMARY KEY, used INTEGER, "
+                              "bytes INTEGER, document BLOB)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS scans_used "
+                              "ON scans (used)")
+        row = self.conn.execute("SELECT COUNT(*), SUM(bytes), MAX(used) "
+                                "FROM scans").fetchone()
+        self.size = row[0]
+        self.total_bytes = row[1] or 0
+        self.clock = row[2] or 0
+
+    def __len__(self):
+        return self.size
+
+    def get(self, scan_id):
+        """Return the cached scan document, or None if it's not cached."""
+        with self.lock:
+            row = self.conn.execute("SELECT document FROM scans WHERE id = ?",
+                                    (scan_id,)).fetchone()
+            if row is None:
+                return None
+            self.clock += 1
+            self.touched[scan_id] = self.clock
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, scan):
+        """Store a completed scan document, evicting old ones if necessary."""
+        document = zlib.compress(json.dumps(scan,
+                                            default=Utility.json_default))
+        with self.lock:
+            old = self.conn.execute("SELECT bytes FROM scans WHERE id = ?",
+                                    (scan["id"],)).fetchone()
+            self.clock += 1
+            self.touched.pop(scan["id"], None)
+            with self.conn:
+                self.write_touched()
+                self.conn.execute("INSERT OR REPLACE INTO scans "
+                                  "(id, used, bytes, document) "
+                                  "VALUES (?, ?, ?, ?)",
+                                  (scan["id"], self.clock, len(document),
+                                   sqlite3.Binary(document)))
+                if old is None:
+                    self.size += 1
+                else:
+                    self.total_bytes -= old[0]
+                self.total_bytes += len(document)
+                self.evict()
+
+    def flush(self):
+        """Write recency noted by cache hits to the database."""
+        with self.lock:
+            with self.conn:
+                self.write_touched()
+
+    def write_touched(self):
+        """Write pending recency updates.  Hold the lock."""
+        if self.touched:
+            self.conn.executemany("UPDATE scans SET used = ? WHERE id = ?",
+                                  [(used, scan_id) for scan_id, used
+                                   in self.touched.items()])
+            self.touched = {}
+
+    def evict(self):
+        """Delete least recently used scans until within limits.
+
+        Hold the lock, and call within a transaction.
+        """
+        if not self.over_limits():
+            return
+        doomed = []
+        rows = self.conn.execute("SELECT id, bytes FROM scans ORDER BY used")
+        for scan_id, size in rows:
+            if not self.over_limits():
+                break
+            doomed.append((scan_id,))
+            self.size -= 1
+            self.total_bytes -= size
+        self.conn.executemany("DELETE FROM scans WHERE id = ?", doomed)
+
+    def over_limits(self):
+        """Return True if the cache holds too many scans or bytes."""
+        return (self.size > self.max_entries or
+                self.total_bytes > self.max_bytes)
@@ -0,0 +1,60 @@
+class ScanFilter(object):
+    """Select scans by module, status, server group and critical findings.
+
+    ``HaloScans`` applies the filter twice.  First to scan metadata from the
+    /v1/scans listing, before any details are retrieved, and again to the
+    scan's details once it's complete, before FIM findings are retrieved.
+
+    A scan which is still running when it's listed has no final status or
+    findings count yet, so only its module and server group are checked at
+    listing time.
+
+    Keyword Args:
+        modules (list): Keep scans from these modules, like ``["fim"]``.
+        statuses (list): Keep scans with these (final) statuses, like
+            ``["completed_with_errors"]``.
+        group_ids (list): Keep scans of servers in these server groups
+            (the scan's ``group_id``).
+        critical_only (bool): Keep only scans with critical findings.
+            Defaults to False.
+
+    """
+    incomplete_statuses = ["queued", "pending", "running"]
+
+    def __init__(self, **kwargs):
+        self.modules = self.as_set(kwargs.get("modules"))
+        self.statuses = self.as_set(kwargs.get("statuses"))
+        self.group_ids = self.as_set(kwargs.get("group_ids"))
+        self.critical_only = kwargs.get("critical_only", False)
+
+    @classmethod
+    def as_set(cls, values):
+        """Return a set of ``values``, or None if not set."""
+        return None if values is None else set(values)
+
+    def matches_listing(self, scan):
+        """Return True if a scan from the /v1/scans listing may match."""
+        return self.matches(scan, scan.get("status") not in
+                            self.incomplete_statuses)
+
+    def matches(self, scan, complete=True):
+        """Return True if the scan matches.
+
+        Args:
+            scan (dict): Scan metadata or details.
+            complete (bool): If False, skip checks which depend on the scan
+                having finished.
+
+        """
+        if self.modules is not None and scan["module"] not in self.modules:
+            return False
+        if (self.group_ids is not None and "group_id" in scan and
+                scan["group_id"] not in self.group_ids):
+            return False
+        if not complete:
+            return True
+        if self.statuses is not None and scan["status"] not in self.statuses:
+            return False
+        if self.critical_only and not scan.get("critical_findings_count"):
+            return False
+        return True
@@ -0,0 +1,125 @@
+import collections
+import hashlib
+import math
+import struct
+import threading
+
+
+class BloomFilter(object):
+    """Fixed-size set of strings, with false positives but no false negatives.
+
+    Args:
+        capacity (int): Number of strings the filter is sized for.
+
+    Keyword Args:
+        error_rate (float): False positive rate at ``capacity``.  Defaults to
+            0.001.
+
+    """
+    def __init__(self, capacity, **kwargs):
+        error_rate = kwargs.get("error_rate", 0.001)
+        self.capacity = capacity
+        self.bits = max(8, int(-capacity * math.log(error_rate) /
+                               (math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.bits / float(capacity) *
+                                       math.log(2))))
+        self.array = bytearray((self.bits + 7) // 8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, value):
+        for position in self.positions(value):
+            if not self.array[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, value):
+        """Add a string to the filter."""
+        for position in self.positions(value):
+            self.array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def positions(self, value):
+        """Return the bit positions for ``value``, by double hashing."""
+        digest = hashlib.md5(value.encode("utf-8")).digest()
+        first, second = struct.unpack("<QQ", digest)
+        return [(first + i * second) % self.bits for i in range(self.hashes)]
+
+
+class SeenIndex(object):
+    """Remember recently ingested scan IDs, to drop duplicates.
+
+    Overlapping time windows, and the scan listing re-reading the scans at a
+    page boundary, list some scans twice.  ``HaloScans`` checks each listed
+    scan here before queueing it, so a duplicate isn't retrieved again.
+
+    IDs are kept in a set until they're more than ``window`` seconds older
+    (by ``created_at``) than the newest scan seen, which bounds memory on a
+    stream that runs forever.  With ``bloom_capacity`` set, evicted IDs go
+    into a Bloom filter instead of being forgotten, so duplicates are caught
+    across a long backfill in a fixed amount of memory.  A Bloom filter has
+    false positives, so about ``bloom_error_rate`` of new scans older than
+    ``window`` would be dropped as duplicates.  Once the filter holds
+    ``bloom_capacity`` IDs, a new one is started, and the oldest of the two
+    is discarded.
+
+    Keyword Args:
+        window (float): Seconds of ``created_at`` for which IDs are kept
+            exactly.  Defaults to 3600.
+        bloom_capacity (int): IDs per Bloom filter.  Defaults to None, for
+            no Bloom filter.
+        bloom_error_rate (float): Bloom filter false positive rate.  Defaults
+            to 0.001.
+
+    """
+    def __init__(self, **kwargs):
+        self.window = kwargs.get("window", 3600)
+        self.bloom_capacity = kwargs.get("bloom_capacity")
+        self.bloom_error_rate = kwargs.get("bloom_error_rate", 0.001)
+        self.ids = set([])
+        self.arrivals = collections.deque()
+        self.newest = None
+        self.blooms = []
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def seen(self, scan_id, created):
+        """Return True if ``scan_id`` was seen before, and remember it.
+
+        Args:
+            scan_id (str): Scan ID.
+            created (float): The scan's ``created_at``, as epoch seconds.
+
+        """
+        with self.lock:
+            if scan_id in self.ids:
+                return True
+            if any(scan_id in bloom for bloom in self.blooms):
+                return True
+            self.ids.add(scan_id)
+            self.arrivals.append((created, scan_id))
+            if self.newest is None or created > self.newest:
+                self.newest = created
+            self.evict()
+            return False
+
+    def evict(self):
+        """Forget IDs which have left the window.  Hold the lock."""
+        horizon = self.newest - self.window
+        while self.arrivals and self.arrivals[0][0] < horizon:
+            scan_id = self.arrivals.popleft()[1]
+            self.ids.discard(scan_id)
+            if self.bloom_capacity is not None:
+                self.remember(scan_id)
+
+    def remember(self, scan_id):
+        """Add an evicted ID to the current Bloom filter.  Hold the lock."""
+        if not self.blooms or len(self.blooms[-1]) >= self.bloom_capacity:
+            self.blooms.append(BloomFilter(self.bloom_capacity,
+                                           error_rate=self.bloom_error_rate))
+            self.blooms = self.blooms[-2:]
+        self.blooms[-1].add(scan_id)
@@ -0,0 +1,341 @@
+import cloudpassage
+import random
+import requests
+import threading
+import time
+from cloudpassage.exceptions import CloudPassageGeneral
+from cloudpassage.exceptions import CloudPassageRateLimit
+from concurrency import AdaptiveConcurrencyLimiter
+from rate_limiter import TokenBucketRateLimiter
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utility import Utility
+
+
+class ManagedHaloSession(cloudpassage.HaloSession):
+    """Halo session which tracks the age of its OAuth token.
+
+    This behaves exactly like ``cloudpassage.HaloSession``, except that the
+    keep-alive connection pool is sized by the ``pool_size`` kwarg, we note
+    the time every time a token is successfully obtained, and we can limit
+    the number of concurrent API requests made through this session, no
+    matter how many threads share it.
+
+    The limit is fixed at ``max_in_flight``, unless ``min_in_flight`` is also
+    set.  Then it's adjusted between the two at runtime, backing off when the
+    API throttles us (or, with ``latency_target``, slows down) and creeping
+    back up while it doesn't.
+
+    With ``rate_limit`` set, requests also draw from a token bucket shared by
+    every thread using the session.  Scan listing (ingestion) requests wait
+    behind detail, polling and findings requests (enrichment), so scans
+    already ingested are finished before more are ingested.
+
+    Requests which are throttled, fail with a 5xx, or can't connect are
+    retried up to ``max_retries`` times, after a random delay of up to
+    ``retry_backoff`` seconds, doubling with each attempt.  This replaces
+    the SDK's own urllib3 retries, so every attempt goes through the rate
+    and concurrency limits, and every 429 reaches the concurrency limiter.
+
+    Args:
+        apikey (str): API key for CloudPassage Halo
+        apisecret (str): API key secret for CloudPassage Halo
+
+    Keyword Args:
+        pool_size (int): Max number of pooled keep-alive connections.
+            Defaults to 10.
+        max_in_flight (int): Max number of concurrent API requests.
+            Defaults to None, for no limit.
+        min_in_flight (int): Lowest the concurrency limit may be adjusted
+            to.  Defaults to None, for a fixed limit.
+        latency_target (float): Requests slower than this many seconds make
+            the concurrency limit back off.  Defaults to None, so only
+            throttling does.
+        rate_limit (float): Max API requests per second.  Defaults to None,
+            for no limit.
+        rate_burst (int): Max burst of requests above ``rate_limit``.
+            Defaults to ``rate_limit``.
+        max_retries (int): Times to retry a throttled or failed request.
+            Defaults to 3.
+        retry_backoff (float): Max delay before the first retry, in seconds.
+            Defaults to 1.
+        metrics (MetricsRegistry): If set, API request counts and latencies
+            are recorded here, by endpoint, along with the concurrency limit.
+
+    """
+    retryable_exceptions = (CloudPassageRateLimit, CloudPassageGeneral,
+                            requests.exceptions.ConnectionError,
+                            requests.exceptions.Timeout)
+    low_priority_endpoints = ["/v1/scans"]
+    max_retry_delay = 60
+
+    def __init__(self, apikey, apisecret, **kwargs):
+        self.pool_size = kwargs.get("pool_size", 10)
+        self.metrics = kwargs.get("metrics")
+        self.request_retries = kwargs.get("max_retries", 3)
+        self.retry_backoff = kwargs.get("retry_backoff", 1)
+        self.token_acquired = None
+        self.limiter = None
+        self.rate_limiter = None
+        if kwargs.get("rate_limit") is not None:
+            rate = kwargs["rate_limit"]
+            burst = kwargs.get("rate_burst") or max(1, int(rate))
+            self.rate_limiter = TokenBucketRateLimiter(rate, burst=burst)
+        if kwargs.get("max_in_flight") is not None:
+            max_in_flight = kwargs["max_in_flight"]
+            min_in_flight = kwargs.get("min_in_flight") or max_in_flight
+            self.limiter = AdaptiveConcurrencyLimiter(
+                min_in_flight, max_in_flight,
+                latency_target=kwargs.get("latency_target"))
+        if self.metrics is not None:
+            self.register_metrics()
+        super(ManagedHaloSession, self).__init__(apikey, apisecret, **kwargs)
+
+    def register_metrics(self):
+        """Create request metrics, and gauges for the concurrency limit."""
+        self.request_seconds = self.metrics.histogram(
+            "haloscans_api_request_seconds", "Halo API request latency.",
+            labelnames=["endpoint"])
+        self.requests_total = self.metrics.counter(
+            "haloscans_api_requests_total", "Halo API requests.",
+            labelnames=["endpoint", "outcome"])
+        self.retries_total = self.metrics.counter(
+            "haloscans_api_retries_total", "Halo API requests retried.",
+            labelnames=["endpoint"])
+        if self.rate_limiter is not None:
+            self.rate_limit_wait = self.metrics.histogram(
+                "haloscans_rate_limit_wait_seconds",
+                "Time spent waiting on the API request rate limit.",
+                labelnames=["priority"])
+        if self.limiter is not None:
+            limit = self.metrics.gauge("haloscans_concurrency_limit",
+                                       "Limit on concurrent API requests.")
+            limit.set_function(lambda: self.limiter.limit)
+            in_use = self.metrics.gauge("haloscans_requests_in_flight",
+                                        "Concurrent API requests.")
+            in_use.set_function(lambda: self.limiter.in_use)
+
+    def build_client(self):
+        """Build the requests session, with a right-sized connection pool.
+
+        The adapter doesn't retry anything itself.  ``interact`` does.
+        """
+        super(ManagedHaloSession, self).build_client()
+        self.retries = Retry(total=0, raise_on_status=False)
+        self.halo_http_adapter = HTTPAdapter(pool_connections=1,
+                                             pool_maxsize=self.pool_size,
+                                             max_retries=self.retries)
+        self.client.mount(self.session_mount, self.halo_http_adapter)
+        return None
+
+    def authenticate_client(self):
+        """Authenticate, and record when we got the token."""
+        success = super(ManagedHaloSession, self).authenticate_client()
+        if success:
+            self.token_acquired = time.time()
+        return success
+
+    def interact(self, verb, endpoint, params=None, reqbody=None):
+        """Make an API request, retrying throttled or failed attempts."""
+        attempt = 0
+        while True:
+            try:
+                return self.limited_interact(verb, endpoint, params, reqbody)
+            except self.retryable_exceptions as e:
+                if attempt >= self.request_retries or not self.retryable(e):
+                    raise
+                delay = self.retry_delay(attempt)
+                attempt += 1
+                print("Retrying %s %s in %.1fs after %s" %
+                      (verb.upper(), endpoint, delay, type(e).__name__))
+                if self.metrics is not None:
+                    label = Utility.endpoint_label(endpoint)
+                    self.retries_total.inc(endpoint=label)
+                time.sleep(delay)
+
+    @classmethod
+    def retryable(cls, exception):
+        """Return True for throttling, 5xx and connection failures.
+
+        The SDK raises ``CloudPassageGeneral`` for any status it doesn't
+        have a more specific exception for, including every 5xx.
+        """
+        if isinstance(exception, CloudPassageGeneral):
+            return getattr(exception, "code", 0) >= 500
+        return isinstance(exception, cls.retryable_exceptions)
+
+    def retry_delay(self, attempt):
+        """Return a random delay before retry number ``attempt`` (from 0)."""
+        ceiling = min(self.max_retry_delay, self.retry_backoff * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    def request_priority(self, endpoint):
+        """Return the rate limiter priority for a request to ``endpoint``."""
+        path = endpoint.split("?")[0].rstrip("/")
+        return 1 if path in self.low_priority_endpoints else 0
+
+    def limited_interact(self, verb, endpoint, params=None, reqbody=None):
+        """Make one API request, within the rate and concurrency limits."""
+        outcome = "error"
+        throttled = False
+        if self.rate_limiter is not None:
+            priority = self.request_priority(endpoint)
+            waited = self.rate_limiter.acquire(priority)
+            if self.metrics is not None:
+                self.rate_limit_wait.observe(waited, priority=priority)
+        started = time.time()
+        if self.limiter is not None:
+            started = self.limiter.acquire()
+        try:
+            response = super(ManagedHaloSession, self).interact(verb,
+                                                                endpoint,
+                                                                params,
+                                                                reqbody)
+            outcome = "ok"
+            throttled = self.was_throttled(response)
+            return response
+        except CloudPassageRateLimit:
+            outcome = "throttled"
+            throttled = True
+            raise
+        except requests.exceptions.RetryError as e:
+            if self.retries_exhausted_by_429(e):
+                outcome = "throttled"
+                throttled = True
+            raise
+        finally:
+            if self.limiter is not None:
+                self.limiter.release(started, throttled)
+            if self.metrics is not None:
+                label = Utility.endpoint_label(endpoint)
+                self.request_seconds.observe(time.time() - started,
+                                             endpoint=label)
+                self.requests_total.inc(endpoint=label, outcome=outcome)
+
+    @classmethod
+    def was_throttled(cls, response):
+        """Return True if the request was retried after a 429 response."""
+        retries = getattr(getattr(response, "raw", None), "retries", None)
+        history = getattr(retries, "history", None) or ()
+        return any(attempt.status == 429 for attempt in history)
+
+    @classmethod
+    def retries_exhausted_by_429(cls, exception):
+        """Return True if urllib3 gave up on a request because of 429s."""
+        max_retry_error = exception.args[0] if exception.args else None
+        reason = getattr(max_retry_error, "reason", None)
+        return "too many 429 " in str(reason)
+
+
+class SessionManager(object):
+    """Share one authenticated Halo session across threads.
+
+    The first caller of ``get_session()`` builds and authenticates the
+    session.  Every caller after that gets the same session object, with its
+    pool of keep-alive connections.  If the OAuth token is within
+    ``refresh_margin`` seconds of expiring, it is refreshed in place before
+    the session is handed out, so in-flight users of the session pick up the
+    new token too.
+
+    Args:
+        halo_key (str): API key for CloudPassage Halo
+        halo_secret (str): API key secret for CloudPassage Halo
+
+    Keyword Args:
+        api_host (str): Hostname for Halo API.  Default is api.cloudpassage.com
+        api_port (str): Port for API endpoint.  Defaults to 443
+        integration_name (str): Name of the tool using this library.
+        ua (str): Complete user agent string.  Overrides integration_name.
+        pool_size (int): Max number of pooled connections.  Defaults to 10.
+        max_in_flight (int): Max number of concurrent API requests across
+            all users of the session.  Defaults to None, for no limit.
+        min_in_flight (int): If set, the limit on concurrent requests adapts
+            between this and ``max_in_flight``.
+        latency_target (float): Requests slower than this count as
+            congestion for the adaptive limit.
+        rate_limit (float): Max API requests per second, across all users
+            of the session.  Defaults to None, for no limit.
+        rate_burst (int): Max burst of requests above ``rate_limit``.
+        max_retries (int): Times to retry a throttled or failed request.
+            Defaults to 3.
+        retry_backoff (float): Max delay before the first retry, in seconds.
+            Defaults to 1.
+        metrics (MetricsRegistry): Registry for API request metrics.
+        token_lifetime (int): Lifetime of a Halo OAuth token, in seconds.
+            Defaults to 900.
+        refresh_margin (int): Refresh the token this many seconds before it
+            expires.  Defaults to 60.
+
+    """
+    session_class = ManagedHaloSession
+
+    def __init__(self, halo_key, halo_secret, **kwargs):
+        self.halo_key = halo_key
+        self.halo_secret = halo_secret
+        self.api_host = "api.cloudpassage.com"
+        self.api_port = 443
+        self.ua = Utility.build_ua("")
+        self.pool_size = 10
+        self.max_in_flight = None
+        self.min_in_flight = None
+        self.latency_target = None
+        self.rate_limit = None
+        self.rate_burst = None
+        self.max_retries = 3
+        self.retry_backoff = 1
+        self.metrics = None
+        self.token_lifetime = 900
+        self.refresh_margin = 60
+        self.halo_session = None
+        self.lock = threading.Lock()
+        self.set_attrs_from_kwargs(kwargs)
+
+    def get_session(self):
+        """Return the shared Halo session, authenticating if necessary."""
+        with self.lock:
+            if self.halo_session is None:
+                self.halo_session = self.build_session()
+            if self.token_expiring():
+                self.halo_session.authenticate_client()
+        return self.halo_session
+
+    def build_session(self):
+        """Instantiate (but do not authenticate) the shared Halo session."""
+        halo_session = self.session_class(self.halo_key, self.halo_secret,
+                                          api_host=self.api_host,
+                                          api_port=self.api_port,
+                                          integration_string=self.ua,
+                                          pool_size=self.pool_size,
+                                          max_in_flight=self.max_in_flight,
+                                          min_in_flight=self.min_in_flight,
+                                          latency_target=self.latency_target,
+                                          rate_limit=self.rate_limit,
+                                          rate_burst=self.rate_burst,
+                                          max_retries=self.max_retries,
+                                          retry_backoff=self.retry_backoff,
+                                          metrics=self.metrics)
+        return halo_session
+
+    def token_expiring(self):
+        """Return True if the token is missing or about to expire."""
+        if self.halo_session is None:
+            return True
+        acquired = self.halo_session.token_acquired
+        if acquired is None:
+            return True
+        token_age = time.time() - acquired
+        return token_age >= (self.token_lifetime - self.refresh_margin)
+
+    def set_attrs_from_kwargs(self, kwargs):
+        """Set instance attributes from kwargs."""
+        arg_list = ["api_host", "api_port", "pool_size", "max_in_flight",
+                    "min_in_flight", "latency_target", "rate_limit",
+                    "rate_burst", "max_retries", "retry_backoff", "metrics",
+                    "token_lifetime", "refresh_margin"]
+        for arg in arg_list:
+            if arg in kwargs:
+                setattr(self, arg, kwargs[arg])
+        if "integration_name" in kwargs:
+            setattr(self, "ua", Utility.build_ua(kwargs["integration_name"]))
+        if "ua" in kwargs:
+            setattr(self, "ua", kwargs["ua"])
@@ -1,5 +1,5 @@
+import calendar
 import datetime
-import operator
 import os
 import re
 import urllib
@@ -7,6 +7,11 @@ from dateutil.parser import parse
 
 
 class Utility(object):
+    object_id_rx = re.compile(r"/[0-9A-Fa-f]{16,}")
+    iso8601_rx = re.compile(r"(\d{4}-\d{2}-\d{2})[T ](\d{2}):(\d{2}):(\d{2})"
+                            r"(?:\.(\d+))?(?:(Z)|([+-])(\d{2}):?(\d{2}))?$")
+    epoch_days = {}
+
     @classmethod
     def date_to_iso8601(cls, date_obj):
         """Returns an ISO8601-formatted string for datetime arg"""
@@ -16,13 +21,74 @@ class Utility(object):
     @classmethod
     def iso8601_now(cls):
         """ISO8601 string for now."""
-        return str(Utility.date_to_iso8601(datetime.datetime.utcnow()) + "Z")
+        return datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
     @classmethod
     def iso_8601_delta(cls, date_1, date_2):
         """Return a datetime.timedelta for date_1 minus date_2."""
-        delta = (parse(date_1) - parse(date_2))
-        return delta
+        seconds = cls.iso8601_to_epoch(date_1) - cls.iso8601_to_epoch(date_2)
+        return datetime.timedelta(seconds=seconds)
+
+    @classmethod
+    def iso8601_to_epoch(cls, timestamp):
+        """Return seconds since the epoch (float) for an ISO8601 string.
+
+        Timestamps without an offset are assumed to be UTC.  Timestamps in
+        Halo's format (``2018-01-01T00:00:00.000Z``, with any precision or
+        offset) are parsed directly.  Anything else goes to ``dateutil``.
+        """
+        match = cls.iso8601_rx.match(timestamp)
+        if match is None:
+            return cls.parse_to_epoch(timestamp)
+        day, hour, minute, second, fraction, utc, sign, off_h, off_m = \
+            match.groups()
+        days = cls.epoch_days.get(day)
+        if days is None:
+            days = cls.day_to_epoch_days(day)
+        epoch = (days * 86400 + int(hour) * 3600 + int(minute) * 60 +
+                 int(second))
+        if sign is not None:
+            offset = int(off_h) * 3600 + int(off_m) * 60
+            epoch = epoch - offset if sign == "+" else epoch + offset
+        if fraction is not None:
+            return epoch + float("0." + fraction)
+        return float(epoch)
+
+    @classmethod
+    def day_to_epoch_days(cls, day):
+        """Return days since the epoch for ``YYYY-MM-DD``, and cache it.
+
+        Scans arrive in time order, so only a few days are ever current.
+        """
+        year, month, date = day.split("-")
+        days = calendar.timegm((int(year), int(month), int(date),
+                                0, 0, 0, 0, 0, 0)) // 86400
+        if len(cls.epoch_days) >= 1000:
+            cls.epoch_days.clear()
+        cls.epoch_days[day] = days
+        return days
+
+    @classmethod
+    def parse_to_epoch(cls, timestamp):
+        """Return seconds since the epoch, parsing with ``dateutil``."""
+        parsed = parse(timestamp)
+        if parsed.utcoffset() is not None:
+            parsed = parsed - parsed.utcoffset()
+        epoch = calendar.timegm(parsed.timetuple())
+        return epoch + parsed.microsecond / 1000000.0
+
+    @classmethod
+    def epoch_to_iso8601(cls, epoch):
+        """ISO8601 string, in UTC, for seconds since the epoch."""
+        date_obj = datetime.datetime.utcfromtimestamp(epoch)
+        return str(Utility.date_to_iso8601(date_obj) + "Z")
+
+    @classmethod
+    def json_default(cls, obj):
+        """``json.dumps`` hook for compact records.  See ``CompactScan``."""
+        if hasattr(obj, "to_json"):
+            return obj.to_json()
+        raise TypeError("%r is not JSON serializable" % obj)
 
     @classmethod
     def read(cls, fname):
@@ -48,12 +114,34 @@ class Utility(object):
             ua_string = "%s %s/%s" % (integration_name, product, version)
         return ua_string
 
+    @classmethod
+    def endpoint_label(cls, endpoint):
+        """Return the path of ``endpoint``, with object IDs replaced by {id}.
+
+        For example, ``/v1/scans/abc123.../findings/def456...?page=2``
+        becomes ``/v1/scans/{id}/findings/{id}``.
+        """
+        path = endpoint.split("?")[0]
+        return cls.object_id_rx.sub("/{id}", path)
+
     @classmethod
     def order_items(cls, items, sort_key):
-        """Return items, sorted by sort_key."""
-        sorted_list = sorted(items, key=operator.itemgetter(sort_key))
+        """Return items, sorted by sort_key.
+
+        ISO8601 timestamps are compared as points in time, so differences in
+        precision or offset don't affect the order.
+        """
+        sorted_list = sorted(items, key=lambda item: cls.sortable(
+            item[sort_key]))
         return sorted_list
 
+    @classmethod
+    def sortable(cls, value):
+        """Return ``value``, or its epoch time if it's an ISO8601 string."""
+        if isinstance(value, basestring) and cls.iso8601_rx.match(value):
+            return cls.iso8601_to_epoch(value)
+        return value
+
     @classmethod
     def sorted_items_from_pages(cls, pages, pagination_key, sort_key):
         """Return items from pages, sorted by ``sort_key``."""
@@ -75,14 +163,19 @@ class Utility(object):
         return url
 
     @classmethod
-    def create_url_batch(cls, base_url, batch_size, modifiers={}):
+    def create_url_batch(cls, base_url, batch_size, modifiers={},
+                         first_page=1):
         """We initially set the 'since' var to the start_timestamp.  The next
         statement will override that value with the last event's timestamp, if
         one is set
 
+        Returns URLs for ``batch_size`` consecutive pages, starting at
+        ``first_page``.  ``modifiers`` is not changed.
+
         """
         url_list = []
-        for page in range(1, batch_size + 1):
+        modifiers = dict(modifiers)
+        for page in range(first_page, first_page + batch_size):
             url = None
             modifiers["page"] = page
             url = Utility.build_url(base_url, modifiers)
@@ -33,6 +33,7 @@ setup(
     packages=["haloscans"],
     install_requires=["cloudpassage >= 1.1.2",
                       "python-dateutil >= 2.6.0"],
+    extras_require={"zstd": ["zstandard"]},
     long_description=get_long_description(["README.rst", "CHANGELOG.rst"]),
     classifiers=[
         "Development Status :: 2 - Pre-Alpha",
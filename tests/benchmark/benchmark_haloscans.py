@@ -0,0 +1,160 @@
+"""Throughput and latency benchmark for HaloScans, against the mock API.
+
+Each combination of ``--threads`` and ``--batch-sizes`` runs in a fresh
+process, against its own mock API server running in another process, and
+reports:
+
+* scans/sec: Scans yielded per second of wall-clock time.
+* p50/p99 ms: Time from a scan first appearing in a /v1/scans page to it
+  being yielded by the iterator.
+* peak RSS MB: Peak resident memory of the client process.
+
+Example::
+
+    python tests/benchmark/benchmark_haloscans.py --scans 2000 \\
+        --latency 0.02 --fim-findings 20 --threads 5,10,20 --batch-sizes 30,90
+"""
+import argparse
+import imp
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+here_dir = os.path.dirname(os.path.abspath(__file__))
+mock_halo_api = imp.load_source("mock_halo_api",
+                                os.path.join(here_dir, "../mock_halo",
+                                             "mock_halo_api.py"))
+haloscans = mock_halo_api.haloscans
+
+
+def percentile(values, pct):
+    """Return the ``pct`` percentile of ``values``, nearest-rank."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0
+    rank = int(round((pct / 100.0) * (len(ordered) - 1)))
+    return ordered[rank]
+
+
+def serve(server_settings, conn):
+    """Run a mock API server until told to stop.  Runs in its own process.
+
+    Sends the server's port and time window once it's listening, then waits
+    for a message on ``conn`` and sends back the time each scan was listed.
+    """
+    server = mock_halo_api.MockHaloAPI(**server_settings)
+    server.start()
+    conn.send({"port": server.port,
+               "start_timestamp": server.start_timestamp,
+               "end_timestamp": server.end_timestamp})
+    conn.recv()
+    server.stop()
+    conn.send(server.listed_at)
+
+
+def run_client(settings, server):
+    """Consume every scan from the mock API.  Runs in its own process.
+
+    Returns:
+        dict: Time each scan was yielded, elapsed seconds and peak RSS.
+
+    """
+    manager = mock_halo_api.LocalSessionManager(
+        "key", "secret", api_host="127.0.0.1", api_port=server["port"],
+        pool_size=settings["max_threads"] * 4)
+    scans = haloscans.HaloScans("", "", session_manager=manager,
+                                max_threads=settings["max_threads"],
+                                batch_size=settings["batch_size"],
+                                start_timestamp=server["start_timestamp"],
+                                end_timestamp=server["end_timestamp"])
+    yielded_at = {}
+    started = time.time()
+    for scan in scans:
+        yielded_at[scan["id"]] = time.time()
+    elapsed = time.time() - started
+    # ru_maxrss is in kilobytes on Linux.
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+    return {"yielded_at": yielded_at, "elapsed": elapsed,
+            "peak_rss_mb": peak_rss}
+
+
+def run_one(settings):
+    """Run one benchmark configuration, with server and client processes.
+
+    The server runs in its own process, so its CPU time and memory don't
+    count against the client.  The client runs in a fresh process, so peak
+    RSS isn't cumulative across configurations.
+    """
+    conn, server_conn = multiprocessing.Pipe()
+    server_process = multiprocessing.Process(target=serve,
+                                             args=(settings["server"],
+                                                   server_conn))
+    server_process.start()
+    server = conn.recv()
+    pool = multiprocessing.Pool(1)
+    try:
+        client = pool.apply(run_client, (settings, server))
+    finally:
+        pool.close()
+        pool.join()
+        conn.send("stop")
+        listed_at = conn.recv()
+        server_process.join()
+    yield_latencies = [yielded - listed_at[scan_id] for scan_id, yielded
+                       in client["yielded_at"].items()]
+    count = len(yield_latencies)
+    return {"max_threads": settings["max_threads"],
+            "batch_size": settings["batch_size"],
+            "scans": count,
+            "scans_per_sec": count / client["elapsed"],
+            "p50_ms": percentile(yield_latencies, 50) * 1000,
+            "p99_ms": percentile(yield_latencies, 99) * 1000,
+            "peak_rss_mb": client["peak_rss_mb"]}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scans", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.01,
+                        help="Seconds of latency per API request.")
+    parser.add_argument("--pending-ratio", type=float, default=0.0,
+                        help="Share of scans still running when retrieved.")
+    parser.add_argument("--fim-findings", type=int, default=10)
+    parser.add_argument("--throttle-ratio", type=float, default=0.0,
+                        help="Share of API requests answered with a 429.")
+    parser.add_argument("--threads", default="10",
+                        help="Comma-separated max_threads settings.")
+    parser.add_argument("--batch-sizes", default="30",
+                        help="Comma-separated batch_size settings.")
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    args = parse_args(argv)
+    configs = []
+    for max_threads in [int(x) for x in args.threads.split(",")]:
+        for batch_size in [int(x) for x in args.batch_sizes.split(",")]:
+            server = {"scans": args.scans,
+                      "latency": args.latency,
+                      "pending_ratio": args.pending_ratio,
+                      "fim_findings": args.fim_findings,
+                      "throttle_ratio": args.throttle_ratio}
+            configs.append({"server": server,
+                            "max_threads": max_threads,
+                            "batch_size": batch_size})
+    results = [run_one(config) for config in configs]
+    header = "%8s %6s %7s %10s %9s %9s %12s" % ("threads", "batch", "scans",
+                                                "scans/sec", "p50 ms",
+                                                "p99 ms", "peak RSS MB")
+    print(header)
+    for result in results:
+        print("%8d %6d %7d %10.1f %9.1f %9.1f %12.1f" %
+              (result["max_threads"], result["batch_size"], result["scans"],
+               result["scans_per_sec"], result["p50_ms"], result["p99_ms"],
+               result["peak_rss_mb"]))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,46 @@
+import imp
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+mock_halo_api = imp.load_source("mock_halo_api",
+                                os.path.join(here_dir, "../mock_halo",
+                                             "mock_halo_api.py"))
+
+
+class TestIntegrationBackfill:
+    def build_backfill(self, server, tmpdir):
+        return haloscans.HaloScansBackfill(
+            "key", "secret", server.start_timestamp, server.end_timestamp,
+            shards=3, processes=2, output_dir=str(tmpdir),
+            session_manager_class=mock_halo_api.LocalSessionManager,
+            api_host="127.0.0.1", api_port=server.port)
+
+    def test_integration_backfill_sharded(self, tmpdir):
+        server = mock_halo_api.MockHaloAPI(scans=60, fim_findings=2)
+        server.start()
+        try:
+            results = list(self.build_backfill(server, tmpdir))
+        finally:
+            server.stop()
+        assert [x["id"] for x in results] == [x["id"] for x in server.scans]
+        assert len(os.listdir(str(tmpdir))) == 3
+
+    def test_integration_backfill_failed_shard(self, tmpdir):
+        server = mock_halo_api.MockHaloAPI(scans=60)
+        server.start()
+        del server.by_id[server.scans[45]["id"]]  # Details now 404.
+        try:
+            backfill = self.build_backfill(server, tmpdir)
+            try:
+                backfill.run()
+                assert False
+            except RuntimeError:
+                pass
+        finally:
+            server.stop()
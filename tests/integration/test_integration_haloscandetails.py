@@ -0,0 +1,43 @@
+import imp
+import os
+import sys
+from multiprocessing.dummy import Pool as ThreadPool
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+mock_halo_api = imp.load_source("mock_halo_api",
+                                os.path.join(here_dir, "../mock_halo",
+                                             "mock_halo_api.py"))
+
+
+class TestIntegrationHaloScanDetails:
+    def test_integration_haloscandetails_shared_findings_pool(self,
+                                                              monkeypatch):
+        server = mock_halo_api.MockHaloAPI(scans=40, fim_findings=8,
+                                           modules=["fim"])
+        server.start()
+        details = haloscans.HaloScanDetails("", "", max_threads=3,
+                                            session_manager=server.manager())
+        workers = ThreadPool(6)
+        try:
+            details.get(server.scans[0]["id"])  # Start the findings pool.
+            pool = details.findings_pool
+            # No more pools may be started, per scan or otherwise.
+            monkeypatch.setattr(haloscans.halo_general, "ThreadPool", None)
+            monkeypatch.setattr(haloscans.haloscandetails, "ThreadPool",
+                                None)
+            results = workers.map(details.get,
+                                  [x["id"] for x in server.scans])
+            assert details.findings_pool is pool
+        finally:
+            workers.close()
+            details.close()
+            server.stop()
+        for scan, result in zip(server.scans, results):
+            assert [x["id"] for x in result["findings"]] == \
+                [x["id"] for x in scan["findings"]]
+            assert result["findings"][0]["file"].startswith("/etc/mock/")
@@ -0,0 +1,162 @@
+import imp
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+mock_halo_api = imp.load_source("mock_halo_api",
+                                os.path.join(here_dir, "../mock_halo",
+                                             "mock_halo_api.py"))
+
+
+class TestIntegrationHaloScans:
+    def test_integration_haloscans_window(self):
+        server = mock_halo_api.MockHaloAPI(scans=120, fim_findings=5)
+        server.start()
+        metrics = haloscans.MetricsRegistry()
+        manager = server.manager(metrics=metrics, pool_size=40)
+        try:
+            scans = haloscans.HaloScans("", "", session_manager=manager,
+                                        metrics=metrics,
+                                        start_timestamp=server.start_timestamp,
+                                        end_timestamp=server.end_timestamp)
+            results = list(scans)
+        finally:
+            server.stop()
+        assert [x["id"] for x in results] == [x["id"] for x in server.scans]
+        fim = [x for x in results if x["module"] == "fim"]
+        assert len(fim) == 30
+        for scan in fim:
+            assert len(scan["findings"]) == 5
+            assert scan["findings"][0]["file"].startswith("/etc/mock/")
+        assert server.requests[("auth", 200)] == 1
+        assert server.requests[("scan", 200)] == 120
+        snapshot = scans.metrics.snapshot()
+        requests = snapshot["haloscans_api_requests_total"]
+        assert requests["/v1/scans/{id}|ok"] == 120
+        assert requests["/v1/scans/{id}/findings/{id}|ok"] == 150
+        assert snapshot["haloscans_scans_total"]["fim"] == 30
+        assert snapshot["haloscans_fim_fetch_seconds"]["count"] == 30
+        assert snapshot["haloscans_currently_enriching"] == 0
+        assert "haloscans_api_request_seconds_bucket{" in \
+            scans.metrics.to_prometheus()
+
+    def test_integration_haloscans_filtered(self):
+        server = mock_halo_api.MockHaloAPI(scans=120, fim_findings=5,
+                                           pending_ratio=0.1)
+        server.start()
+        scan_filter = haloscans.ScanFilter(modules=["fim", "sca"],
+                                           critical_only=True)
+        try:
+            scans = haloscans.HaloScans("", "",
+                                        session_manager=server.manager(),
+                                        scan_filter=scan_filter,
+                                        fields=["critical_findings_count"],
+                                        start_timestamp=server.start_timestamp,
+                                        end_timestamp=server.end_timestamp)
+            results = list(scans)
+        finally:
+            server.stop()
+        expected = [x["id"] for x in server.scans
+                    if x["module"] in ["fim", "sca"] and
+                    x["critical_findings_count"]]
+        assert [x["id"] for x in results] == expected
+        assert sorted(results[0].keys()) == ["created_at",
+                                             "critical_findings_count",
+                                             "id", "module", "status"]
+        assert server.requests[("scan", 200)] < 60
+        assert ("finding", 200) not in server.requests
+
+    def test_integration_haloscans_metadata_only(self):
+        server = mock_halo_api.MockHaloAPI(scans=120)
+        server.start()
+        try:
+            scans = haloscans.HaloScans("", "",
+                                        session_manager=server.manager(),
+                                        metadata_only=True,
+                                        start_timestamp=server.start_timestamp,
+                                        end_timestamp=server.end_timestamp)
+            results = list(scans)
+        finally:
+            server.stop()
+        assert [x["id"] for x in results] == [x["id"] for x in server.scans]
+        assert "findings" not in results[0]
+        assert ("scan", 200) not in server.requests
+        assert server.requests[("list", 200)] == 4  # One prefetch batch.
+
+    def test_integration_haloscans_compact_records(self):
+        server = mock_halo_api.MockHaloAPI(scans=40, fim_findings=5)
+        server.start()
+        try:
+            scans = haloscans.HaloScans("", "",
+                                        session_manager=server.manager(),
+                                        compact_records=True,
+                                        start_timestamp=server.start_timestamp,
+                                        end_timestamp=server.end_timestamp)
+            results = list(scans)
+        finally:
+            server.stop()
+        assert [x["id"] for x in results] == [x["id"] for x in server.scans]
+        fim = [x for x in results if x["module"] == "fim"]
+        assert isinstance(fim[0], haloscans.compact.CompactScan)
+        assert len(fim[0]["findings"]) == 5
+        assert fim[0]["findings"][0]["file"].startswith("/etc/mock/")
+        assert fim[0].to_dict()["findings"] == list(fim[0]["findings"])
+
+    def test_integration_haloscans_aggregator(self):
+        server = mock_halo_api.MockHaloAPI(scans=70, fim_findings=3)
+        server.start()
+        rollups = haloscans.ScanAggregator(bucket_seconds=3600, top_k=3)
+        try:
+            scans = haloscans.HaloScans("", "",
+                                        session_manager=server.manager(),
+                                        aggregator=rollups,
+                                        start_timestamp=server.start_timestamp,
+                                        end_timestamp=server.end_timestamp)
+            results = list(scans)
+        finally:
+            server.stop()
+        snapshot = rollups.snapshot()
+        assert snapshot["totals"]["scans"] == len(results) == 70
+        assert snapshot["totals"]["by_module"] == dict(
+            (module, count) for module, count in
+            scans.scans_by_module.items())
+        assert snapshot["distinct_servers"] == 7
+        failing = {}
+        for scan in server.scans:
+            failing[scan["server_id"]] = (
+                failing.get(scan["server_id"], 0) +
+                scan["critical_findings_count"] +
+                scan["non_critical_findings_count"])
+        expected = sorted(failing.items(), key=lambda x: -x[1])[:3]
+        assert [x[1] for x in snapshot["top_servers"]] == [
+            x[1] for x in expected]
+
+    def test_integration_haloscans_overlapping_windows(self):
+        server = mock_halo_api.MockHaloAPI(scans=60)
+        server.start()
+        seen_index = haloscans.SeenIndex()
+        middle = server.scans[40]["created_at"]
+        overlap = server.scans[20]["created_at"]
+        try:
+            first = haloscans.HaloScans("", "",
+                                        session_manager=server.manager(),
+                                        seen_index=seen_index,
+                                        start_timestamp=server.start_timestamp,
+                                        end_timestamp=middle)
+            second = haloscans.HaloScans("", "",
+                                         session_manager=server.manager(),
+                                         seen_index=seen_index,
+                                         start_timestamp=overlap,
+                                         end_timestamp=server.end_timestamp)
+            results = list(first) + list(second)
+        finally:
+            server.stop()
+        assert [x["id"] for x in results] == [x["id"] for x in server.scans]
+        assert server.requests[("scan", 200)] == 60
+        snapshot = second.metrics.snapshot()
+        assert snapshot["haloscans_scans_deduplicated_total"] == 20
@@ -0,0 +1,54 @@
+import imp
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+mock_halo_api = imp.load_source("mock_halo_api",
+                                os.path.join(here_dir, "../mock_halo",
+                                             "mock_halo_api.py"))
+
+
+def tenant(name, server, **kwargs):
+    result = {"name": name, "halo_key": "", "halo_secret": "",
+              "session_manager": server.manager(),
+              "start_timestamp": server.start_timestamp,
+              "end_timestamp": server.end_timestamp}
+    result.update(kwargs)
+    return result
+
+
+class TestIntegrationMultiTenant:
+    def test_integration_multi_tenant_stream(self):
+        servers = [mock_halo_api.MockHaloAPI(scans=60, fim_findings=3),
+                   mock_halo_api.MockHaloAPI(scans=90, pending_ratio=0.1)]
+        for server in servers:
+            server.start()
+        scan_filter = haloscans.ScanFilter(modules=["fim"])
+        try:
+            stream = haloscans.MultiTenantHaloScans(
+                [tenant("one", servers[0], scan_filter=scan_filter),
+                 tenant("two", servers[1])],
+                max_threads=4, batch_size=6, tenant_batch_size=3,
+                end_timestamp=max(x.end_timestamp for x in servers))
+            results = list(stream)
+        finally:
+            for server in servers:
+                server.stop()
+        one = [x for x in results if x["tenant"] == "one"]
+        two = [x for x in results if x["tenant"] == "two"]
+        assert len(one) + len(two) == len(results)
+        assert [x["id"] for x in one] == [x["id"] for x in servers[0].scans
+                                          if x["module"] == "fim"]
+        assert [x["id"] for x in two] == [x["id"] for x in servers[1].scans]
+        assert len(one[0]["findings"]) == 3
+        # Tenants take turns, so neither waits for the other to finish.
+        first_two = [x["tenant"] for x in results].index("two")
+        assert first_two < len(one)
+        assert stream.tenants["two"].metrics.snapshot()[
+            "haloscans_scans_total"]["fim"] == 23
+        assert stream.active_enrichments() == 0
@@ -0,0 +1,57 @@
+import imp
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+mock_halo_api = imp.load_source("mock_halo_api",
+                                os.path.join(here_dir, "../mock_halo",
+                                             "mock_halo_api.py"))
+exceptions = haloscans.session_manager.cloudpassage.exceptions
+
+
+class TestIntegrationSessionManager:
+    def test_integration_session_manager_retries_exhausted(self):
+        server = mock_halo_api.MockHaloAPI(scans=1, throttle_ratio=1.0)
+        server.start()
+        session = server.manager(max_retries=2, retry_backoff=0.01,
+                                 max_in_flight=8,
+                                 min_in_flight=1).get_session()
+        scan_id = server.scans[0]["id"]
+        try:
+            try:
+                session.interact("get", "/v1/scans/%s" % scan_id)
+                assert False
+            except exceptions.CloudPassageRateLimit:
+                pass
+        finally:
+            server.stop()
+        assert server.requests[("scan", 429)] == 3
+        assert session.limiter.limit == 1
+
+    def test_integration_session_manager_throttled_stream(self):
+        server = mock_halo_api.MockHaloAPI(scans=40, fim_findings=3,
+                                           throttle_ratio=0.2)
+        server.start()
+        metrics = haloscans.MetricsRegistry()
+        manager = server.manager(metrics=metrics, max_retries=10,
+                                 retry_backoff=0.01, rate_limit=500,
+                                 pool_size=40)
+        try:
+            scans = haloscans.HaloScans("", "", session_manager=manager,
+                                        metrics=metrics,
+                                        start_timestamp=server.start_timestamp,
+                                        end_timestamp=server.end_timestamp)
+            results = list(scans)
+        finally:
+            server.stop()
+        assert [x["id"] for x in results] == [x["id"] for x in server.scans]
+        throttled = sum(count for (endpoint, code), count
+                        in server.requests.items() if code == 429)
+        retries = metrics.snapshot()["haloscans_api_retries_total"]
+        assert throttled > 0
+        assert sum(retries.values()) == throttled
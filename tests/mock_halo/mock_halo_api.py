@@ -0,0 +1,258 @@
+"""Local, in-process stand-in for the parts of the Halo API we use.
+
+Serves ``/oauth/access_token``, ``/v1/scans``, ``/v1/scans/{id}`` and
+``/v1/scans/{id}/findings/{id}`` over plain HTTP on localhost, from a set of
+generated scans.  Latency, the share of scans which are still running when
+first retrieved, FIM findings per scan and 429 responses are all
+configurable.
+
+Example::
+
+    server = MockHaloAPI(scans=500, latency=0.02, fim_findings=20)
+    server.start()
+    scans = haloscans.HaloScans("", "", session_manager=server.manager(),
+                                start_timestamp=server.start_timestamp,
+                                end_timestamp=server.end_timestamp)
+    ...
+    server.stop()
+"""
+import BaseHTTPServer
+import SocketServer
+import bisect
+import datetime
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urlparse
+
+here_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(here_dir, '../../'))
+import haloscans  # NOQA
+from haloscans.session_manager import ManagedHaloSession  # NOQA
+from haloscans.session_manager import SessionManager  # NOQA
+
+
+class LocalHaloSession(ManagedHaloSession):
+    """Halo session which talks plain HTTP to the mock API."""
+    def build_client(self):
+        super(LocalHaloSession, self).build_client()
+        self.client.mount("http://", self.halo_http_adapter)
+
+    def build_endpoint_prefix(self):
+        return "http://%s:%s" % (self.api_host, self.api_port)
+
+
+class LocalSessionManager(SessionManager):
+    session_class = LocalHaloSession
+
+
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn,
+                          BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class MockHaloHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    scan_rx = re.compile(r"^/v1/scans/([0-9a-f]+)$")
+    finding_rx = re.compile(r"^/v1/scans/([0-9a-f]+)/findings/([0-9a-f]+)$")
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.send_json(200, {"access_token": "mocktoken", "expires_in": 900,
+                             "scope": "read"}, "auth")
+
+    def do_GET(self):
+        api = self.server.api
+        url = urlparse.urlparse(self.path)
+        params = dict(urlparse.parse_qsl(url.query))
+        scan_match = self.scan_rx.match(url.path)
+        finding_match = self.finding_rx.match(url.path)
+        if url.path == "/v1/scans":
+            endpoint, body = "list", api.list_scans(params)
+        elif scan_match:
+            endpoint, body = "scan", api.scan_details(scan_match.group(1))
+        elif finding_match:
+            endpoint, body = "finding", api.finding(*finding_match.groups())
+        else:
+            return self.send_json(404, {"error": "not found"}, "other")
+        if body is None:
+            return self.send_json(404, {"error": "not found"}, endpoint)
+        time.sleep(api.latency)
+        if api.throttled():
+            return self.send_json(429, {"error": "slow down"}, endpoint)
+        self.send_json(200, body, endpoint)
+
+    def send_json(self, code, body, endpoint):
+        self.server.api.count(endpoint, code)
+        payload = json.dumps(body)
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class MockHaloAPI(object):
+    """Generated scans, served by a threaded HTTP server on localhost.
+
+    Keyword Args:
+        scans (int): Number of scans to serve.  Defaults to 100.
+        interval (float): Seconds between consecutive scans' ``created_at``.
+            Defaults to 0.01.
+        modules (list): Modules to cycle through.  FIM scans get findings
+            details.  Defaults to ``["sca", "fim", "svm", "csm"]``.
+        latency (float): Seconds to wait before answering each API request.
+            Defaults to 0.
+        pending_ratio (float): Share of scans still running when first
+            retrieved.  Defaults to 0.
+        pending_polls (int): Number of detail retrievals for which a pending
+            scan stays running.  Defaults to 1.
+        fim_findings (int): Findings per FIM scan.  Defaults to 10.
+        throttle_ratio (float): Share of API requests answered with a 429.
+            Defaults to 0.
+        seed (int): Random seed.  Defaults to 0.
+
+    """
+    def __init__(self, **kwargs):
+        self.scan_count = kwargs.get("scans", 100)
+        self.interval = kwargs.get("interval", 0.01)
+        self.modules = kwargs.get("modules", ["sca", "fim", "svm", "csm"])
+        self.latency = kwargs.get("latency", 0)
+        self.pending_ratio = kwargs.get("pending_ratio", 0)
+        self.pending_polls = kwargs.get("pending_polls", 1)
+        self.fim_findings = kwargs.get("fim_findings", 10)
+        self.throttle_ratio = kwargs.get("throttle_ratio", 0)
+        self.random = random.Random(kwargs.get("seed", 0))
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.polls = {}
+        self.listed_at = {}
+        self.scans = []
+        self.epochs = []
+        self.build_scans(time.time() - self.scan_count * self.interval)
+        self.server = None
+
+    def build_scans(self, first_epoch):
+        """Generate scans, oldest first."""
+        for index in range(self.scan_count):
+            module = self.modules[index % len(self.modules)]
+            created = first_epoch + (index * self.interval)
+            pending = self.random.random() < self.pending_ratio
+            findings = []
+            if module == "fim":
+                findings = [{"id": "%032x" % ((index << 16) + x),
+                             "status": "bad" if x % 3 == 0 else "good",
+                             "critical": x % 5 == 0}
+                            for x in range(self.fim_findings)]
+            self.epochs.append(created)
+            self.scans.append({"id": "%032x" % (index + 1),
+                               "module": module,
+                               "status": "completed_clean",
+                               "created_at": self.timestamp(created),
+                               "server_id": "%032x" % (index % 7),
+                               "group_id": "group%d" % (index % 3),
+                               "critical_findings_count": index % 3,
+                               "non_critical_findings_count": index % 2,
+                               "pending": pending,
+                               "findings": findings})
+        self.by_id = dict([(scan["id"], scan) for scan in self.scans])
+        self.start_timestamp = self.scans[0]["created_at"]
+        last = first_epoch + (self.scan_count * self.interval)
+        self.end_timestamp = self.timestamp(last)
+
+    @classmethod
+    def timestamp(cls, epoch):
+        date_obj = datetime.datetime.utcfromtimestamp(epoch)
+        return date_obj.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+    def start(self):
+        """Start serving on a free port on localhost."""
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), MockHaloHandler)
+        self.server.api = self
+        self.port = self.server.server_address[1]
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def manager(self, **kwargs):
+        """Return a session manager for talking to this server."""
+        return LocalSessionManager("key", "secret", api_host="127.0.0.1",
+                                   api_port=self.port, **kwargs)
+
+    def count(self, endpoint, code):
+        with self.lock:
+            key = (endpoint, code)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def throttled(self):
+        with self.lock:
+            return self.random.random() < self.throttle_ratio
+
+    def status(self, scan):
+        """Return the scan's status, counting this as one retrieval."""
+        with self.lock:
+            polls = self.polls.get(scan["id"], 0) + 1
+            self.polls[scan["id"]] = polls
+        if scan["pending"] and polls <= self.pending_polls:
+            return "running"
+        return scan["status"]
+
+    def listing(self, scan):
+        """The scan as it appears in /v1/scans results."""
+        listed = dict((k, v) for k, v in scan.items()
+                      if k not in ["pending", "findings"])
+        if scan["pending"] and self.polls.get(scan["id"], 0) == 0:
+            listed["status"] = "running"
+        return listed
+
+    def list_scans(self, params):
+        since = haloscans.Utility.iso8601_to_epoch(params["since"])
+        until = float("inf")
+        if "until" in params:
+            until = haloscans.Utility.iso8601_to_epoch(params["until"])
+        page = int(params.get("page", 1))
+        per_page = int(params.get("per_page", 50))
+        first = bisect.bisect_left(self.epochs, since)
+        last = bisect.bisect_right(self.epochs, until)
+        matches = self.scans[first:last]
+        start = (page - 1) * per_page
+        results = [self.listing(scan)
+                   for scan in matches[start:start + per_page]]
+        now = time.time()
+        with self.lock:
+            for scan in results:
+                self.listed_at.setdefault(scan["id"], now)
+        return {"scans": results}
+
+    def scan_details(self, scan_id):
+        scan = self.by_id.get(scan_id)
+        if scan is None:
+            return None
+        details = dict((k, v) for k, v in scan.items() if k != "pending")
+        details["status"] = self.status(scan)
+        details["findings"] = [{"id": finding["id"]}
+                               for finding in scan["findings"]]
+        return {"scan": details}
+
+    def finding(self, scan_id, finding_id):
+        scan = self.by_id.get(scan_id)
+        if scan is None:
+            return None
+        for finding in scan["findings"]:
+            if finding["id"] == finding_id:
+                detail = dict(finding)
+                detail["file"] = "/etc/mock/%s" % finding_id
+                return {"findings": [detail]}
+        return None
@@ -4,6 +4,9 @@ import re
 
 heredir = os.path.abspath(os.path.dirname(__file__))
 unit_test_directory = os.path.join(heredir, '../unit')
+integration_test_directory = os.path.join(heredir, '../integration')
+mock_halo_directory = os.path.join(heredir, '../mock_halo')
+benchmark_directory = os.path.join(heredir, '../benchmark')
 code_directory = os.path.join(heredir, '../../haloscans')
 
 
@@ -27,7 +30,10 @@ def get_all_py_files(directory):
 class TestF8:
     def test_f8(self):
         dirs_to_test = [code_directory,
-                        unit_test_directory]
+                        unit_test_directory,
+                        integration_test_directory,
+                        mock_halo_directory,
+                        benchmark_directory]
         files_to_test = []
         for d in dirs_to_test:
             files_to_test.extend(get_all_py_files(d))
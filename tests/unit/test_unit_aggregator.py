@@ -0,0 +1,91 @@
+import imp
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+aggregator = haloscans.aggregator
+
+
+def scan(minute, module="sca", server="srv1", critical=0, noncritical=0,
+         status="completed_clean"):
+    return {"id": "%s-%s-%s" % (minute, module, server), "module": module,
+            "status": status, "server_id": server,
+            "created_at": "2017-01-01T00:%02d:30.000Z" % minute,
+            "critical_findings_count": critical,
+            "non_critical_findings_count": noncritical}
+
+
+class TestUnitAggregator:
+    def test_unit_aggregator_totals(self):
+        rollups = haloscans.ScanAggregator()
+        rollups.add(scan(0, critical=2, noncritical=1))
+        rollups.add(scan(0, module="fim", status="completed_with_errors"))
+        rollups.add(scan(1, server="srv2", noncritical=4))
+        totals = rollups.snapshot()["totals"]
+        assert totals["scans"] == 3
+        assert totals["by_module"] == {"sca": 2, "fim": 1}
+        assert totals["by_status"] == {"completed_clean": 2,
+                                       "completed_with_errors": 1}
+        assert totals["critical_scans"] == 1
+        assert totals["failing_findings"] == 7
+
+    def test_unit_aggregator_buckets(self):
+        rollups = haloscans.ScanAggregator(bucket_seconds=60,
+                                           window_buckets=3)
+        for minute in [0, 1, 1, 2]:
+            rollups.add(scan(minute))
+        snapshot = rollups.snapshot()
+        assert [x["scans"] for x in snapshot["buckets"]] == [1, 2, 1]
+        assert snapshot["buckets"][0]["start"].startswith(
+            "2017-01-01T00:00:00")
+        assert snapshot["window"]["scans"] == 4
+        assert snapshot["window"]["scans_per_second"] == 4 / 180.0
+        rollups.add(scan(4))  # Pushes minutes 0 and 1 out of the window.
+        rollups.add(scan(0))  # Too old for the window; totals only.
+        snapshot = rollups.snapshot()
+        assert [x["scans"] for x in snapshot["buckets"]] == [1, 1]
+        assert snapshot["window"]["scans"] == 2
+        assert snapshot["totals"]["scans"] == 6
+
+    def test_unit_aggregator_fim_findings(self):
+        fim = {"id": "x", "module": "fim", "status": "completed_clean",
+               "created_at": "2017-01-01T00:00:00Z", "server_id": "srv1",
+               "findings": [{"status": "bad"}, {"status": "good"},
+                            {"status": "bad"}]}
+        assert haloscans.ScanAggregator.failing_findings(fim) == 2
+
+    def test_unit_aggregator_top_servers(self):
+        rollups = haloscans.ScanAggregator(top_k=2, top_k_capacity=3)
+        for server, failing in [("a", 5), ("b", 1), ("c", 9), ("a", 5),
+                                ("d", 1), ("e", 1)]:
+            rollups.add(scan(0, server=server, noncritical=failing))
+        top = rollups.snapshot()["top_servers"]
+        assert [x[0] for x in top] == ["a", "c"]
+        assert top[0][1:] == (10, 0)
+
+    def test_unit_aggregator_distinct_servers(self):
+        rollups = haloscans.ScanAggregator()
+        for x in range(2000):
+            rollups.add(scan(x % 60, server="srv%d" % (x % 500)))
+        assert 475 <= rollups.snapshot()["distinct_servers"] <= 525
+
+    def test_unit_hyperloglog_large(self):
+        counter = aggregator.HyperLogLog(precision=10)
+        for x in range(20000):
+            counter.add("server-%d" % x)
+        assert abs(counter.estimate() - 20000) < 20000 * 0.1
+        assert len(counter.registers) == 1024
+
+    def test_unit_space_saving_bounded(self):
+        heavy = aggregator.SpaceSaving(5)
+        for x in range(100):
+            heavy.add("light-%d" % x)
+            heavy.add("heavy", 3)
+        assert len(heavy.counters) == 5
+        assert heavy.top(1)[0][0] == "heavy"
+        assert heavy.top(1)[0][1] >= 300
@@ -0,0 +1,35 @@
+import imp
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+
+
+class TestUnitBackfill:
+    def test_unit_backfill_instantiate(self):
+        assert haloscans.HaloScansBackfill("", "", "2018-01-01",
+                                           "2018-01-02")
+
+    def test_unit_backfill_windows(self):
+        backfill = haloscans.HaloScansBackfill("", "", "2018-01-01",
+                                               "2018-01-02", shards=4)
+        windows = list(backfill.get_windows())
+        assert len(windows) == 4
+        assert windows[0][0] == "2018-01-01"
+        assert windows[1][0] == "2018-01-01T06:00:00Z"
+        assert windows[-1][1] == "2018-01-02"
+        for first, second in zip(windows[:-1], windows[1:]):
+            assert first[1] == second[0]
+
+    def test_unit_backfill_rejects_checkpoint(self):
+        try:
+            haloscans.HaloScansBackfill("", "", "2018-01-01", "2018-01-02",
+                                        checkpoint=object())
+            assert False
+        except ValueError:
+            pass
@@ -0,0 +1,70 @@
+import imp
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+
+
+class TestUnitCheckpoint:
+    def test_unit_checkpoint_file_round_trip(self, tmpdir):
+        path = str(tmpdir.join("checkpoint.json"))
+        checkpoint = haloscans.FileCheckpoint(path)
+        assert checkpoint.load() is None
+        checkpoint.save("2018-01-01T00:00:00.000Z", ["abc"])
+        checkpoint.save("2018-01-01T00:00:01.000Z", ["def", "ghi"])
+        assert checkpoint.load() == {"created_at": "2018-01-01T00:00:01.000Z",
+                                     "ids": ["def", "ghi"]}
+        assert os.listdir(str(tmpdir)) == ["checkpoint.json"]
+
+    def test_unit_checkpoint_sqlite_round_trip(self, tmpdir):
+        path = str(tmpdir.join("checkpoint.db"))
+        checkpoint = haloscans.SQLiteCheckpoint(path)
+        assert checkpoint.load() is None
+        checkpoint.save("2018-01-01T00:00:00.000Z", ["abc"])
+        other = haloscans.SQLiteCheckpoint(path, name="other")
+        assert other.load() is None
+        reopened = haloscans.SQLiteCheckpoint(path)
+        assert reopened.load() == {"created_at": "2018-01-01T00:00:00.000Z",
+                                   "ids": ["abc"]}
+
+    def test_unit_checkpoint_haloscans_resume(self, tmpdir):
+        path = str(tmpdir.join("checkpoint.json"))
+        checkpoint = haloscans.FileCheckpoint(path)
+        scans = haloscans.HaloScans("", "", checkpoint=checkpoint,
+                                    start_timestamp="2017-01-01")
+        assert scans.search_params["since"] == "2017-01-01"
+        scans.commit_checkpoint({"id": "a", "created_at": "2018-01-01"})
+        scans.commit_checkpoint({"id": "b", "created_at": "2018-01-02"})
+        scans.commit_checkpoint({"id": "c", "created_at": "2018-01-02"})
+        scans.save_checkpoint()
+        resumed = haloscans.HaloScans("", "", checkpoint=checkpoint,
+                                      start_timestamp="2017-01-01")
+        assert resumed.search_params["since"] == "2018-01-02"
+        assert resumed.checkpoint_ids == ["b", "c"]
+
+    def test_unit_checkpoint_haloscans_batches_saves(self, tmpdir):
+        saves = []
+
+        class RecordingCheckpoint(object):
+            def load(self):
+                return None
+
+            def save(self, created_at, ids):
+                saves.append((created_at, list(ids)))
+
+        scans = haloscans.HaloScans("", "", checkpoint=RecordingCheckpoint(),
+                                    checkpoint_every=3,
+                                    checkpoint_interval=60)
+        for scan_id in range(7):
+            scans.commit_checkpoint({"id": str(scan_id),
+                                     "created_at": "2018-01-01"})
+        assert [len(ids) for created_at, ids in saves] == [3, 6]
+        scans.save_checkpoint()
+        scans.save_checkpoint()
+        assert len(saves) == 3
+        assert saves[-1][1] == [str(x) for x in range(7)]
@@ -0,0 +1,57 @@
+import imp
+import json
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+compact = haloscans.compact
+
+
+class TestUnitCompact:
+    def build_scan(self, scan_id):
+        findings = [{"id": "%s-%d" % (scan_id, x), "status": u"bad",
+                     "file": u"/etc/%d" % (x % 2)} for x in range(4)]
+        findings[1]["critical"] = True
+        return {"id": scan_id, "module": u"fim", "status": u"completed_clean",
+                "findings": findings}
+
+    def test_unit_compact_scan_mapping(self):
+        interner = compact.StringInterner()
+        scan = self.build_scan("a")
+        record = compact.CompactScan(scan, interner)
+        assert record["module"] == "fim"
+        assert record.get("missing") is None
+        assert sorted(record.keys()) == sorted(scan.keys())
+        assert record.to_dict() == scan
+        assert len(record["findings"]) == 4
+        assert record["findings"][1] == scan["findings"][1]
+        assert record["findings"][-1] == scan["findings"][-1]
+        assert "critical" not in record["findings"][0]
+
+    def test_unit_compact_scan_interning(self):
+        interner = compact.StringInterner()
+        first = compact.CompactScan(self.build_scan("a"), interner)
+        second = compact.CompactScan(self.build_scan("b"), interner)
+        assert first["status"] is second["status"]
+        assert first["findings"][0]["file"] is second["findings"][2]["file"]
+        assert first.index is second.index
+
+    def test_unit_compact_scan_json(self):
+        interner = compact.StringInterner()
+        scan = self.build_scan("a")
+        record = compact.CompactScan(scan, interner)
+        encoded = json.dumps(record, default=haloscans.Utility.json_default)
+        assert json.loads(encoded) == scan
+
+    def test_unit_compact_finding_table_from_pages(self):
+        interner = compact.StringInterner()
+        pages = [{"findings": [{"id": "a"}, {"id": "b"}]},
+                 {"findings": [{"id": "c", "file": "/etc"}]}]
+        table = compact.FindingTable.from_pages(pages, "findings", interner)
+        assert list(table) == haloscans.Utility.items_from_pages(pages,
+                                                                 "findings")
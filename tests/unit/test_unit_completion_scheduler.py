@@ -0,0 +1,71 @@
+import imp
+import os
+import sys
+import time
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+completion_scheduler = haloscans.completion_scheduler
+
+
+def poll(scan_body):
+    scan_body = dict(scan_body)
+    scan_body["polls"] += 1
+    if scan_body["polls"] >= 2:
+        scan_body["status"] = "completed_clean"
+    return scan_body
+
+
+def is_complete(scan_body):
+    return scan_body["status"] == "completed_clean"
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class TestUnitCompletionScheduler:
+    def test_unit_completion_scheduler_completes(self):
+        ready = []
+        scheduler = completion_scheduler.CompletionScheduler(
+            poll, is_complete, lambda k, b: ready.append((k, b)),
+            initial_delay=0.01, max_delay=0.05)
+        scheduler.start()
+        for key in range(3):
+            scheduler.defer(key, {"status": "running", "polls": 0},
+                            time.time() + 30)
+        wait_for(lambda: len(ready) == 3)
+        scheduler.stop()
+        assert sorted([k for k, b in ready]) == [0, 1, 2]
+        for key, body in ready:
+            assert body["status"] == "completed_clean"
+            assert body["polls"] == 2
+        assert len(scheduler) == 0
+
+    def test_unit_completion_scheduler_deadline(self):
+        ready = []
+        scheduler = completion_scheduler.CompletionScheduler(
+            poll, lambda b: False, lambda k, b: ready.append(k),
+            initial_delay=10)
+        scheduler.start()
+        scheduler.defer("late", {"status": "running", "polls": 0},
+                        time.time() + 0.1)
+        wait_for(lambda: ready)
+        scheduler.stop()
+        assert ready == ["late"]
+
+    def test_unit_completion_scheduler_error(self):
+        def explode(scan_body):
+            raise ValueError("boom")
+        scheduler = completion_scheduler.CompletionScheduler(
+            explode, is_complete, lambda k, b: None, initial_delay=0)
+        scheduler.start()
+        scheduler.defer(1, {"status": "running"}, time.time() + 30)
+        wait_for(lambda: scheduler.error is not None)
+        assert isinstance(scheduler.error, ValueError)
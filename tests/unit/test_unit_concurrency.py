@@ -0,0 +1,57 @@
+import imp
+import os
+import sys
+import threading
+import time
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+concurrency = haloscans.concurrency
+
+
+class TestUnitConcurrency:
+    def test_unit_concurrency_additive_increase(self):
+        limiter = concurrency.AdaptiveConcurrencyLimiter(1, 10,
+                                                         initial_limit=2)
+        for _ in range(4):
+            limiter.release(limiter.acquire())
+        assert limiter.limit == 3
+        for _ in range(100):
+            limiter.release(limiter.acquire())
+        assert limiter.limit == 10
+
+    def test_unit_concurrency_multiplicative_decrease(self):
+        limiter = concurrency.AdaptiveConcurrencyLimiter(2, 16)
+        slots = [limiter.acquire() for _ in range(3)]
+        for slot in slots:
+            limiter.release(slot, throttled=True)
+        assert limiter.limit == 8
+        limiter.release(limiter.acquire(), throttled=True)
+        limiter.release(limiter.acquire(), throttled=True)
+        limiter.release(limiter.acquire(), throttled=True)
+        assert limiter.limit == 2
+
+    def test_unit_concurrency_latency_target(self):
+        limiter = concurrency.AdaptiveConcurrencyLimiter(1, 8,
+                                                         latency_target=0.01)
+        slot = limiter.acquire()
+        time.sleep(0.02)
+        limiter.release(slot)
+        assert limiter.limit == 4
+
+    def test_unit_concurrency_blocks_at_limit(self):
+        limiter = concurrency.AdaptiveConcurrencyLimiter(1, 1)
+        slot = limiter.acquire()
+        waiter = threading.Thread(target=limiter.acquire)
+        waiter.daemon = True
+        waiter.start()
+        time.sleep(0.1)
+        assert waiter.is_alive()
+        limiter.release(slot)
+        waiter.join(5)
+        assert not waiter.is_alive()
+        assert limiter.in_use == 1
@@ -1,6 +1,7 @@
 import imp
 import os
 import sys
+import time
 
 module_name = 'haloscans'
 here_dir = os.path.dirname(os.path.abspath(__file__))
@@ -13,3 +14,42 @@ haloscans = imp.load_module(module_name, fp, pathname, description)
 class TestUnitHaloScanDetails:
     def test_unit_haloscandetails_instantiate(self):
         assert haloscans.HaloScanDetails("", "")
+
+    def test_unit_haloscandetails_is_complete(self):
+        details = haloscans.HaloScanDetails("", "")
+        assert not details.is_complete({"status": "running"})
+        assert details.is_complete({"status": "completed_clean"})
+
+    def test_unit_haloscandetails_timed_out(self):
+        details = haloscans.HaloScanDetails("", "", scan_timeout=300)
+        old_scan = {"id": "abc", "created_at": "2018-01-01T00:00:00.000Z"}
+        new_scan = {"id": "def", "created_at": haloscans.Utility.iso8601_now()}
+        assert details.timed_out(old_scan)
+        assert not details.timed_out(new_scan)
+
+    def test_unit_haloscandetails_timed_out_epoch_key(self):
+        details = haloscans.HaloScanDetails("", "", scan_timeout=300)
+        scan = {"id": "abc"}  # No created_at, so the key must be used.
+        assert details.timed_out(scan, time.time() - 301)
+        assert not details.timed_out(scan, time.time())
+        assert details.deadline(scan, 1000.0) == 1300.0
+
+    def test_unit_haloscandetails_cache(self, tmpdir):
+        cache = haloscans.ScanCache(str(tmpdir.join("cache.db")))
+        details = haloscans.HaloScanDetails("", "", cache=cache)
+        calls = []
+
+        def fake_get_scan(scan_id):
+            calls.append(scan_id)
+            return {"id": scan_id, "module": "sca",
+                    "status": "completed_clean"}
+
+        details.get_scan = fake_get_scan
+        assert details.get("abc") == details.get("abc")
+        assert calls == ["abc"]
+
+    def test_unit_haloscandetails_cache_skips_incomplete(self, tmpdir):
+        cache = haloscans.ScanCache(str(tmpdir.join("cache.db")))
+        details = haloscans.HaloScanDetails("", "", cache=cache)
+        details.finalize({"id": "abc", "module": "sca", "status": "running"})
+        assert details.get_cached("abc") is None
@@ -1,6 +1,9 @@
 import imp
 import os
 import sys
+import threading
+import time
+import urlparse
 
 module_name = 'haloscans'
 here_dir = os.path.dirname(os.path.abspath(__file__))
@@ -10,6 +13,224 @@ fp, pathname, description = imp.find_module(module_name)
 haloscans = imp.load_module(module_name, fp, pathname, description)
 
 
+class FakeEnricher(object):
+    """Stand-in for HaloScanDetails. Earlier scans take longer."""
+    def __init__(self, cached=None):
+        self.cached = cached or {}
+        self.retrieved = []
+
+    def get_cached(self, scan_id):
+        return self.cached.get(scan_id)
+
+    def get_scan(self, scan_id):
+        self.retrieved.append(scan_id)
+        time.sleep(0.05 * (5 - int(scan_id)))
+        return {"id": scan_id}
+
+    def finalize(self, details):
+        return details
+
+    def project(self, details):
+        return details
+
+    def is_complete(self, scan_body):
+        return True
+
+    def timed_out(self, scan_body, created=None):
+        return False
+
+    def close(self):
+        pass
+
+
+class ParkingEnricher(FakeEnricher):
+    """Scan 0 never completes, so it waits in the completion scheduler."""
+    def get_scan(self, scan_id):
+        self.retrieved.append(scan_id)
+        return {"id": scan_id}
+
+    def is_complete(self, scan_body):
+        return scan_body["id"] != "0"
+
+    def deadline(self, scan_body, created=None):
+        return time.time() + 300
+
+
+class FakeResponse(object):
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class FakeSession(object):
+    """Serves /v1/scans pages from a list of scans, like the Halo API."""
+    def __init__(self, scans):
+        self.scans = scans
+        self.requests = []
+
+    def interact(self, verb, endpoint, params):
+        if params is None:
+            params = dict(urlparse.parse_qsl(urlparse.urlparse(
+                endpoint).query))
+            params["page"] = int(params["page"])
+            params["per_page"] = int(params["per_page"])
+        self.requests.append(dict(params))
+        with_since = [x for x in self.scans
+                      if x["created_at"] >= params["since"]]
+        matches = with_since
+        if "until" in params:
+            matches = [x for x in with_since
+                       if x["created_at"] <= params["until"]]
+        start = (params["page"] - 1) * params["per_page"]
+        page = matches[start:start + params["per_page"]]
+        return FakeResponse({"scans": page})
+
+
 class TestUnitHaloScans:
     def test_unit_haloscans_instantiate(self):
         assert haloscans.HaloScans("", "")
+
+    def test_unit_haloscans_enricher_preserves_order(self):
+        scans = haloscans.HaloScans("", "", max_threads=5)
+        scans.enricher = FakeEnricher()
+        for scan_id in range(5):
+            scans.scans_unprocessed.put((0, {"id": str(scan_id)}))
+        enrich = threading.Thread(target=scans.scan_enricher)
+        enrich.daemon = True
+        enrich.start()
+        deadline = time.time() + 10
+        while scans.completed_scans.qsize() < 5 and time.time() < deadline:
+            time.sleep(0.05)
+        scans.shutdown = True
+        enrich.join(5)
+        completed = [scans.completed_scans.get(timeout=5)["id"]
+                     for x in range(5)]
+        assert completed == ["0", "1", "2", "3", "4"]
+        assert scans.currently_enriching == 0
+
+    def test_unit_haloscans_enricher_uses_cache(self):
+        scans = haloscans.HaloScans("", "", max_threads=5)
+        scans.enricher = FakeEnricher({"1": {"id": "1", "cached": True},
+                                       "3": {"id": "3", "cached": True}})
+        for scan_id in range(5):
+            scans.scans_unprocessed.put((0, {"id": str(scan_id)}))
+        enrich = threading.Thread(target=scans.scan_enricher)
+        enrich.daemon = True
+        enrich.start()
+        completed = [scans.completed_scans.get(timeout=10)
+                     for x in range(5)]
+        scans.shutdown = True
+        enrich.join(5)
+        assert [x["id"] for x in completed] == ["0", "1", "2", "3", "4"]
+        assert [x.get("cached", False) for x in completed] == [
+            False, True, False, True, False]
+        assert sorted(scans.enricher.retrieved) == ["0", "2", "4"]
+
+    def test_unit_haloscans_parked_scan_does_not_stall(self):
+        scans = haloscans.HaloScans("", "", max_threads=2, batch_size=2,
+                                    reorder_window=20)
+        scans.enricher = ParkingEnricher()
+        for scan_id in range(30):
+            scans.scans_unprocessed.put((0, {"id": str(scan_id)}))
+        enrich = threading.Thread(target=scans.scan_enricher)
+        enrich.daemon = True
+        enrich.start()
+        deadline = time.time() + 10
+        while scans.currently_enriching < 20 and time.time() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.2)
+        scans.shutdown = True
+        enrich.join(5)
+        assert len(scans.enricher.retrieved) == 20
+        assert scans.active_enrichments == 0
+        assert scans.completed_scans.empty()
+
+    def test_unit_haloscans_max_lag_releases_past_parked_scan(self):
+        scans = haloscans.HaloScans("", "", max_threads=2, max_lag=0.2)
+        scans.enricher = ParkingEnricher()
+        for scan_id in range(5):
+            scans.scans_unprocessed.put((float(scan_id),
+                                         {"id": str(scan_id)}))
+        enrich = threading.Thread(target=scans.scan_enricher)
+        enrich.daemon = True
+        enrich.start()
+        completed = [scans.completed_scans.get(timeout=10)["id"]
+                     for x in range(4)]
+        scans.shutdown = True
+        enrich.join(5)
+        assert completed == ["1", "2", "3", "4"]
+        snapshot = scans.metrics.snapshot()
+        assert snapshot["haloscans_scans_out_of_order_total"] == 4
+        assert scans.checkpoint_hold() == haloscans.Utility.epoch_to_iso8601(
+            0)
+
+    def test_unit_haloscans_metadata_passthrough(self):
+        scans = haloscans.HaloScans("", "", max_threads=5,
+                                    enrich_when=lambda x: x["id"] == "2")
+        scans.enricher = FakeEnricher()
+        for scan_id in range(5):
+            status = "running" if scan_id == 4 else "completed_clean"
+            scans.scans_unprocessed.put((0, {"id": str(scan_id),
+                                             "listed": True,
+                                             "status": status}))
+        enrich = threading.Thread(target=scans.scan_enricher)
+        enrich.daemon = True
+        enrich.start()
+        completed = [scans.completed_scans.get(timeout=10)
+                     for x in range(5)]
+        scans.shutdown = True
+        enrich.join(5)
+        assert [x["id"] for x in completed] == ["0", "1", "2", "3", "4"]
+        assert [x.get("listed", False) for x in completed] == [
+            True, True, False, True, False]
+        assert sorted(scans.enricher.retrieved) == ["2", "4"]
+        snapshot = scans.metrics.snapshot()
+        assert snapshot["haloscans_scans_passed_through_total"] == 3
+
+    def test_unit_haloscans_enqueue_blocks_when_full(self):
+        scans = haloscans.HaloScans("", "", completed_queue_size=2)
+        filler = threading.Thread(target=scans.enqueue_completed,
+                                  args=([{"id": x} for x in range(3)],))
+        filler.daemon = True
+        filler.start()
+        time.sleep(0.2)
+        assert filler.is_alive()
+        assert scans.completed_scans.qsize() == 2
+        assert scans.completed_scans.get(timeout=5)["id"] == 0
+        filler.join(5)
+        assert not filler.is_alive()
+        assert scans.completed_scans.qsize() == 2
+
+    def test_unit_haloscans_paged_scan_stream_bounded(self):
+        timestamps = ["2018-01-01T00:00:0%d.000Z" % x for x in range(3)]
+        all_scans = [{"id": "%s" % x,
+                      "created_at": timestamps[min(x // 4, 2)]}
+                     for x in range(12)]
+        scans = haloscans.HaloScans("", "", start_timestamp="2018-01-01",
+                                    end_timestamp=timestamps[2])
+        scans.page_size = 3
+        scans.halo_session = FakeSession(all_scans)
+        streamed = [x["id"] for _, x in scans.paged_scan_stream()]
+        assert streamed == [str(x) for x in range(8)]
+
+    def test_unit_haloscans_paged_scan_stream_prefetch(self):
+        timestamps = ["2018-01-01T00:00:%02d.000Z" % x for x in range(40)]
+        all_scans = [{"id": "%s" % x, "created_at": timestamps[x]}
+                     for x in range(40)]
+        scans = haloscans.HaloScans("", "", start_timestamp="2018-01-01",
+                                    prefetch_pages=3)
+        scans.page_size = 5
+        scans.poll_interval = 0
+        scans.halo_session = FakeSession(all_scans)
+        stream = scans.paged_scan_stream()
+        streamed = [next(stream)[1]["id"] for x in range(40)]
+        assert streamed == [str(x) for x in range(40)]
+        requests = scans.halo_session.requests
+        assert [x["page"] for x in requests] == [1, 2, 3] * 3
+        # Caught up: new scans are polled for one page at a time.
+        all_scans.append({"id": "40", "created_at": "2018-01-01T00:01:00Z"})
+        assert next(stream)[1]["id"] == "40"
+        assert [x["page"] for x in requests[9:]] == [1]
+        scans.shutdown = True
@@ -0,0 +1,53 @@
+import imp
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+
+
+class TestUnitMetrics:
+    def test_unit_metrics_counter(self):
+        registry = haloscans.MetricsRegistry()
+        counter = registry.counter("requests_total", "Requests.",
+                                   labelnames=["endpoint"])
+        counter.inc(endpoint="/v1/scans")
+        counter.inc(2, endpoint="/v1/scans")
+        assert registry.counter("requests_total", "Requests.") is counter
+        assert registry.snapshot() == {"requests_total": {"/v1/scans": 3}}
+        text = registry.to_prometheus()
+        assert "# TYPE requests_total counter" in text
+        assert 'requests_total{endpoint="/v1/scans"} 3' in text
+
+    def test_unit_metrics_gauge_function(self):
+        registry = haloscans.MetricsRegistry()
+        depth = [5]
+        registry.gauge("depth", "Queue depth.").set_function(lambda: depth[0])
+        assert registry.snapshot()["depth"] == 5
+        depth[0] = 7
+        assert "depth 7" in registry.to_prometheus()
+
+    def test_unit_metrics_histogram(self):
+        registry = haloscans.MetricsRegistry()
+        histogram = registry.histogram("wait_seconds", "Wait.",
+                                       buckets=[1, 10])
+        for value in [0.5, 5, 50]:
+            histogram.observe(value)
+        assert registry.snapshot()["wait_seconds"] == {"count": 3,
+                                                       "sum": 55.5}
+        text = registry.to_prometheus()
+        assert 'wait_seconds_bucket{le="1"} 1' in text
+        assert 'wait_seconds_bucket{le="10"} 2' in text
+        assert 'wait_seconds_bucket{le="+Inf"} 3' in text
+        assert "wait_seconds_count 3" in text
+
+    def test_unit_metrics_haloscans_gauges(self):
+        scans = haloscans.HaloScans("", "")
+        snapshot = scans.metrics.snapshot()
+        assert snapshot["haloscans_unprocessed_queue_depth"] == 0
+        assert snapshot["haloscans_enrichment_lag_seconds"] == 0
+        assert snapshot["haloscans_uptime_seconds"] >= 0
@@ -0,0 +1,76 @@
+import imp
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+
+
+def build_stream(tenant_batch_size=10):
+    tenants = [{"name": name, "halo_key": "", "halo_secret": ""}
+               for name in ["a", "b", "c"]]
+    stream = haloscans.MultiTenantHaloScans(
+        tenants, tenant_batch_size=tenant_batch_size)
+    dispatched = []
+    for tenant in stream.streams:
+        def dispatch(created, listed, tenant=tenant):
+            tenant.active_enrichments += 1
+            dispatched.append(listed["id"])
+        tenant.dispatch_scan = dispatch
+    return stream, dispatched
+
+
+class TestUnitMultiTenant:
+    def test_unit_multi_tenant_tags_and_settings(self):
+        stream, _ = build_stream(tenant_batch_size=4)
+        assert sorted(stream.tenants.keys()) == ["a", "b", "c"]
+        for name, tenant in stream.tenants.items():
+            assert tenant.tenant == name
+            assert tenant.batch_size == 4
+            assert tenant.in_flight is stream.in_flight
+        scans = stream.tenants["a"]
+        scans.reorder_buffer = haloscans.reorder_buffer.WatermarkBuffer(
+            scans.enqueue_completed)
+        scans.reorder_buffer.dispatch((0, 0))
+        scans.active_enrichments = scans.currently_enriching = 1
+        scans.release_scan((0, 0), {"id": "x"})
+        assert scans.completed_scans.get_nowait()["tenant"] == "a"
+
+    def test_unit_multi_tenant_fair_dispatch(self):
+        stream, dispatched = build_stream()
+        for x in range(6):
+            stream.tenants["a"].scans_unprocessed.put((0, {"id": "a%d" % x}))
+        stream.tenants["c"].scans_unprocessed.put((0, {"id": "c0"}))
+        turn = 0
+        while True:
+            index = stream.dispatch_next(turn)
+            if index is None:
+                break
+            turn = index + 1
+        assert dispatched == ["a0", "c0", "a1", "a2", "a3", "a4", "a5"]
+
+    def test_unit_multi_tenant_tenant_cap(self):
+        stream, dispatched = build_stream(tenant_batch_size=2)
+        for x in range(5):
+            stream.tenants["a"].scans_unprocessed.put((0, {"id": "a%d" % x}))
+            stream.tenants["b"].scans_unprocessed.put((0, {"id": "b%d" % x}))
+        turn = 0
+        while True:
+            index = stream.dispatch_next(turn)
+            if index is None:
+                break
+            turn = index + 1
+        assert dispatched == ["a0", "b0", "a1", "b1"]
+        assert stream.active_enrichments() == 4
+
+    def test_unit_multi_tenant_rejects_shared_metrics(self):
+        try:
+            haloscans.MultiTenantHaloScans(
+                [], metrics=haloscans.MetricsRegistry())
+        except ValueError:
+            return
+        assert False
@@ -0,0 +1,56 @@
+import gzip
+import imp
+import json
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+
+
+class TestUnitNDJSONSink:
+    def scans(self, count):
+        return [{"id": "%032x" % x, "module": "sca"} for x in range(count)]
+
+    def read_all(self, paths, opener=open):
+        lines = []
+        for path in paths:
+            with opener(path) as ndjson_file:
+                lines.extend(ndjson_file.read().splitlines())
+        return [json.loads(line) for line in lines]
+
+    def test_unit_ndjson_sink_plain(self, tmpdir):
+        with haloscans.NDJSONSink(str(tmpdir)) as sink:
+            assert sink.consume(self.scans(50)) == 50
+        assert len(sink.files) == 1
+        assert os.listdir(str(tmpdir)) == [os.path.basename(sink.files[0])]
+        assert self.read_all(sink.files) == self.scans(50)
+
+    def test_unit_ndjson_sink_gzip_rotation(self, tmpdir):
+        sink = haloscans.NDJSONSink(str(tmpdir), compression="gzip",
+                                    rotate_bytes=1000, batch_size=5)
+        sink.consume(self.scans(100))
+        sink.close()
+        assert len(sink.files) > 1
+        assert all(path.endswith(".ndjson.gz") for path in sink.files)
+        assert self.read_all(sink.files, gzip.open) == self.scans(100)
+
+    def test_unit_ndjson_sink_bad_compression(self, tmpdir):
+        try:
+            haloscans.NDJSONSink(str(tmpdir), compression="lzma")
+            assert False
+        except ValueError:
+            pass
+
+    def test_unit_ndjson_sink_writer_error(self, tmpdir):
+        sink = haloscans.NDJSONSink(str(tmpdir.join("missing")))
+        sink.write({"id": "a"})
+        try:
+            sink.close()
+            assert False
+        except IOError:
+            pass
@@ -0,0 +1,50 @@
+import imp
+import os
+import sys
+import threading
+import time
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+rate_limiter = haloscans.rate_limiter
+
+
+class TestUnitRateLimiter:
+    def test_unit_rate_limiter_burst(self):
+        limiter = rate_limiter.TokenBucketRateLimiter(1, burst=5)
+        started = time.time()
+        for _ in range(5):
+            limiter.acquire()
+        assert time.time() - started < 0.5
+
+    def test_unit_rate_limiter_rate(self):
+        limiter = rate_limiter.TokenBucketRateLimiter(50, burst=1)
+        started = time.time()
+        for _ in range(11):
+            limiter.acquire()
+        assert time.time() - started >= 0.19
+
+    def test_unit_rate_limiter_priority(self):
+        limiter = rate_limiter.TokenBucketRateLimiter(20, burst=1)
+        limiter.acquire()
+        order = []
+        lock = threading.Lock()
+
+        def take(priority):
+            limiter.acquire(priority)
+            with lock:
+                order.append(priority)
+
+        low = [threading.Thread(target=take, args=(1,)) for _ in range(3)]
+        for thread in low:
+            thread.start()
+        time.sleep(0.01)
+        high = threading.Thread(target=take, args=(0,))
+        high.start()
+        for thread in low + [high]:
+            thread.join()
+        assert order[0] == 0
@@ -0,0 +1,64 @@
+import imp
+import os
+import sys
+import time
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+reorder_buffer = haloscans.reorder_buffer
+
+
+class TestUnitReorderBuffer:
+    def test_unit_reorder_buffer_in_order(self):
+        released = []
+        buf = reorder_buffer.ReorderBuffer(released.extend)
+        assert buf.add(0, "a") == 1
+        assert buf.add(1, "b") == 1
+        assert released == ["a", "b"]
+
+    def test_unit_reorder_buffer_out_of_order(self):
+        released = []
+        buf = reorder_buffer.ReorderBuffer(released.extend)
+        assert buf.add(2, "c") == 0
+        assert buf.add(1, "b") == 0
+        assert released == []
+        assert len(buf) == 2
+        assert buf.add(0, "a") == 3
+        assert released == ["a", "b", "c"]
+        assert len(buf) == 0
+
+    def test_unit_watermark_buffer_created_order(self):
+        released = []
+        buf = reorder_buffer.WatermarkBuffer(released.extend)
+        for key in [(2.0, 0), (1.0, 1), (3.0, 2)]:
+            buf.dispatch(key)
+        assert buf.add((3.0, 2), "c") == 0
+        assert buf.add((2.0, 0), "b") == 0
+        assert len(buf) == 2
+        assert buf.add((1.0, 1), "a") == 3
+        assert released == ["a", "b", "c"]
+        assert buf.overtaken() is None
+
+    def test_unit_watermark_buffer_max_lag(self):
+        released = []
+        flagged = []
+        buf = reorder_buffer.WatermarkBuffer(released.extend, max_lag=0.05,
+                                             flag_callback=flagged.append)
+        buf.dispatch((1.0, 0))
+        buf.dispatch((2.0, 1))
+        buf.dispatch((3.0, 2))
+        buf.add((2.0, 1), "b")
+        buf.add((3.0, 2), None)
+        assert buf.expire() == 0
+        time.sleep(0.1)
+        assert buf.expire() == 2
+        assert released == ["b", None]
+        assert flagged == [1]
+        assert buf.overtaken() == (1.0, 0)
+        assert buf.add((1.0, 0), "a") == 1
+        assert released == ["b", None, "a"]
+        assert buf.overtaken() is None
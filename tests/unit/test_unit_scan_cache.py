@@ -0,0 +1,59 @@
+import imp
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+
+
+class TestUnitScanCache:
+    def test_unit_scan_cache_round_trip(self, tmpdir):
+        path = str(tmpdir.join("cache.db"))
+        cache = haloscans.ScanCache(path)
+        scan = {"id": "abc", "status": "completed_clean",
+                "findings": [{"id": "def", "status": "bad"}]}
+        assert cache.get("abc") is None
+        cache.put(scan)
+        cache.put(scan)
+        assert len(cache) == 1
+        assert haloscans.ScanCache(path).get("abc") == scan
+
+    def test_unit_scan_cache_lru_eviction(self, tmpdir):
+        cache = haloscans.ScanCache(str(tmpdir.join("cache.db")),
+                                    max_entries=2)
+        cache.put({"id": "a"})
+        cache.put({"id": "b"})
+        cache.get("a")
+        cache.put({"id": "c"})
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") == {"id": "a"}
+        assert cache.get("c") == {"id": "c"}
+
+    def test_unit_scan_cache_byte_limit(self, tmpdir):
+        cache = haloscans.ScanCache(str(tmpdir.join("cache.db")),
+                                    max_bytes=2000)
+        for scan_id in range(10):
+            findings = [{"id": "%s-%d" % (scan_id, x), "file": str(x * 7)}
+                        for x in range(100)]
+            cache.put({"id": str(scan_id), "findings": findings})
+        assert cache.total_bytes <= 2000
+        assert 0 < len(cache) < 10
+        assert cache.get("9") is not None
+        assert cache.get("0") is None
+
+    def test_unit_scan_cache_recency_survives_reopen(self, tmpdir):
+        path = str(tmpdir.join("cache.db"))
+        cache = haloscans.ScanCache(path)
+        cache.put({"id": "a"})
+        cache.put({"id": "b"})
+        cache.get("a")
+        cache.flush()
+        reopened = haloscans.ScanCache(path, max_entries=2)
+        reopened.put({"id": "c"})
+        assert reopened.get("b") is None
+        assert reopened.get("a") == {"id": "a"}
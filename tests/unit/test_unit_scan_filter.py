@@ -0,0 +1,51 @@
+import imp
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+
+
+class TestUnitScanFilter:
+    def test_unit_scan_filter_empty(self):
+        scan_filter = haloscans.ScanFilter()
+        assert scan_filter.matches({"module": "sca", "status": "running"})
+
+    def test_unit_scan_filter_module_and_group(self):
+        scan_filter = haloscans.ScanFilter(modules=["fim"],
+                                           group_ids=["a"])
+        assert scan_filter.matches({"module": "fim", "group_id": "a",
+                                    "status": "completed_clean"})
+        assert not scan_filter.matches({"module": "sca", "group_id": "a",
+                                        "status": "completed_clean"})
+        assert not scan_filter.matches_listing({"module": "fim",
+                                                "group_id": "b",
+                                                "status": "running"})
+
+    def test_unit_scan_filter_defers_incomplete(self):
+        scan_filter = haloscans.ScanFilter(statuses=["completed_with_errors"],
+                                           critical_only=True)
+        running = {"module": "sca", "status": "running",
+                   "critical_findings_count": 0}
+        assert scan_filter.matches_listing(running)
+        assert not scan_filter.matches(running)
+        done = {"module": "sca", "status": "completed_with_errors",
+                "critical_findings_count": 2}
+        assert scan_filter.matches_listing(done)
+        assert scan_filter.matches(done)
+        done["critical_findings_count"] = 0
+        assert not scan_filter.matches_listing(done)
+
+    def test_unit_scan_filter_projection(self):
+        details = haloscans.HaloScanDetails("", "", fields=["server_id"])
+        scan = {"id": "a", "module": "fim", "status": "completed_clean",
+                "created_at": "2018-01-01", "server_id": "b",
+                "findings": [{"id": "c"}], "extra": 1}
+        projected = details.project(scan)
+        assert sorted(projected.keys()) == ["created_at", "id", "module",
+                                            "server_id", "status"]
+        assert not details.wants_findings(projected)
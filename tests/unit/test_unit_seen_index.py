@@ -0,0 +1,46 @@
+import imp
+import os
+import sys
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+seen_index = haloscans.seen_index
+
+
+class TestUnitSeenIndex:
+    def test_unit_seen_index_duplicates(self):
+        index = haloscans.SeenIndex(window=60)
+        assert not index.seen("a", 0)
+        assert not index.seen("b", 1)
+        assert index.seen("a", 0)
+        assert len(index) == 2
+
+    def test_unit_seen_index_evicts_by_time(self):
+        index = haloscans.SeenIndex(window=60)
+        index.seen("a", 0)
+        index.seen("b", 30)
+        index.seen("c", 100)
+        assert len(index) == 1
+        assert not index.seen("a", 0)
+
+    def test_unit_seen_index_bloom(self):
+        index = haloscans.SeenIndex(window=10, bloom_capacity=100,
+                                    bloom_error_rate=0.000001)
+        for x in range(300):
+            assert not index.seen("scan-%d" % x, x)
+        assert len(index) <= 11
+        assert index.seen("scan-250", 250)  # Evicted, but in the filter.
+        assert len(index.blooms) == 2
+        assert index.seen("scan-50", 50) is False  # Its filter was dropped.
+
+    def test_unit_bloom_filter(self):
+        bloom = seen_index.BloomFilter(1000, error_rate=0.01)
+        for x in range(1000):
+            bloom.add("in-%d" % x)
+        assert all("in-%d" % x in bloom for x in range(1000))
+        false_positives = sum(1 for x in range(10000) if "out-%d" % x in bloom)
+        assert false_positives < 300
@@ -0,0 +1,134 @@
+import imp
+import os
+import sys
+import threading
+import time
+
+module_name = 'haloscans'
+here_dir = os.path.dirname(os.path.abspath(__file__))
+module_path = os.path.join(here_dir, '../../')
+sys.path.append(module_path)
+fp, pathname, description = imp.find_module(module_name)
+haloscans = imp.load_module(module_name, fp, pathname, description)
+
+
+class TestUnitSessionManager:
+    def test_unit_session_manager_instantiate(self):
+        assert haloscans.SessionManager("", "")
+
+    def test_unit_session_manager_token_expiring_no_session(self):
+        manager = haloscans.SessionManager("", "")
+        assert manager.token_expiring()
+
+    def test_unit_session_manager_token_expiring(self):
+        manager = haloscans.SessionManager("", "", token_lifetime=900,
+                                           refresh_margin=60)
+        manager.halo_session = manager.build_session()
+        manager.halo_session.token_acquired = time.time()
+        assert not manager.token_expiring()
+        manager.halo_session.token_acquired = time.time() - 850
+        assert manager.token_expiring()
+
+    def test_unit_session_manager_pool_size(self):
+        manager = haloscans.SessionManager("", "", pool_size=25)
+        session = manager.build_session()
+        assert session.halo_http_adapter._pool_maxsize == 25
+
+    def test_unit_session_manager_shared_by_haloscans(self):
+        scans = haloscans.HaloScans("", "")
+        assert scans.enricher.session_manager is scans.session_manager
+
+    def test_unit_session_manager_max_in_flight(self):
+        manager = haloscans.SessionManager("", "", max_in_flight=2)
+        session = manager.build_session()
+        session.auth_token = "token"
+        state = {"now": 0, "peak": 0}
+        lock = threading.Lock()
+
+        def fake_try_wrapper(verb, url, params, reqbody):
+            with lock:
+                state["now"] += 1
+                state["peak"] = max(state["peak"], state["now"])
+            time.sleep(0.05)
+            with lock:
+                state["now"] -= 1
+            return True, None, None
+
+        session.try_wrapper = fake_try_wrapper
+        threads = [threading.Thread(target=session.interact,
+                                    args=("get", "/v1/scans"))
+                   for x in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert state["peak"] == 2
+
+    def test_unit_session_manager_was_throttled(self):
+        class Attempt(object):
+            def __init__(self, status):
+                self.status = status
+
+        class Holder(object):
+            pass
+
+        response = Holder()
+        response.raw = Holder()
+        response.raw.retries = Holder()
+        response.raw.retries.history = (Attempt(503), Attempt(429))
+        session_class = haloscans.SessionManager.session_class
+        assert session_class.was_throttled(response)
+        response.raw.retries.history = (Attempt(503),)
+        assert not session_class.was_throttled(response)
+        assert not session_class.was_throttled(None)
+
+    def test_unit_session_manager_request_priority(self):
+        session = haloscans.SessionManager("", "").build_session()
+        assert session.request_priority("/v1/scans") == 1
+        assert session.request_priority("/v1/scans/abc") == 0
+
+    def test_unit_session_manager_retryable(self):
+        exceptions = haloscans.session_manager.cloudpassage.exceptions
+        session_class = haloscans.SessionManager.session_class
+        assert session_class.retryable(
+            exceptions.CloudPassageRateLimit("", code=429))
+        assert session_class.retryable(
+            exceptions.CloudPassageGeneral("", code=503))
+        assert not session_class.retryable(
+            exceptions.CloudPassageGeneral("", code=418))
+        assert not session_class.retryable(
+            exceptions.CloudPassageResourceExistence("", code=404))
+
+    def test_unit_session_manager_retry_error_is_throttling(self):
+        urllib3 = haloscans.session_manager.requests.packages.urllib3
+        retry_error = haloscans.session_manager.requests.exceptions.RetryError
+        session_class = haloscans.SessionManager.session_class
+        throttled = urllib3.exceptions.MaxRetryError(
+            None, "/v1/scans", urllib3.exceptions.ResponseError(
+                "too many 429 error responses"))
+        failed = urllib3.exceptions.MaxRetryError(
+            None, "/v1/scans", urllib3.exceptions.ResponseError(
+                "too many 503 error responses"))
+        assert session_class.retries_exhausted_by_429(retry_error(throttled))
+        assert not session_class.retries_exhausted_by_429(retry_error(failed))
+
+    def test_unit_session_manager_retry_error_backs_off(self):
+        retry_error = haloscans.session_manager.requests.exceptions.RetryError
+        urllib3 = haloscans.session_manager.requests.packages.urllib3
+        manager = haloscans.SessionManager("", "", max_in_flight=8,
+                                           min_in_flight=1, max_retries=0)
+        session = manager.build_session()
+        session.auth_token = "token"
+
+        def fake_try_wrapper(verb, url, params, reqbody):
+            reason = urllib3.exceptions.ResponseError(
+                "too many 429 error responses")
+            raise retry_error(urllib3.exceptions.MaxRetryError(None, url,
+                                                               reason))
+
+        session.try_wrapper = fake_try_wrapper
+        try:
+            session.interact("get", "/v1/scans/abc")
+        except retry_error:
+            pass
+        assert session.limiter.limit == 4
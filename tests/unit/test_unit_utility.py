@@ -1,6 +1,7 @@
 import imp
 import os
 import sys
+import time
 
 module_name = 'haloscans'
 here_dir = os.path.dirname(os.path.abspath(__file__))
@@ -48,3 +49,57 @@ class TestUnitUtility:
                                                            pagination_key,
                                                            sort_field)
         assert expected == actual
+
+    def test_unit_utility_iso8601_to_epoch(self):
+        assert haloscans.Utility.iso8601_to_epoch(
+            "1970-01-01T00:01:00.500Z") == 60.5
+        assert haloscans.Utility.iso8601_to_epoch(
+            "1970-01-01T01:00:00+01:00") == 0
+
+    def test_unit_utility_endpoint_label(self):
+        scan_id = "0123456789abcdef0123456789abcdef"
+        endpoint = "/v1/scans/%s/findings/%s?page=2" % (scan_id, scan_id)
+        expected = "/v1/scans/{id}/findings/{id}"
+        assert haloscans.Utility.endpoint_label(endpoint) == expected
+        assert haloscans.Utility.endpoint_label("/v1/scans") == "/v1/scans"
+
+    def test_unit_utility_iso8601_to_epoch_formats(self):
+        utility = haloscans.Utility
+        expected = utility.parse_to_epoch("2018-03-04T05:06:07.123456Z")
+        assert utility.iso8601_to_epoch(
+            "2018-03-04T05:06:07.123456Z") == expected
+        assert utility.iso8601_to_epoch("2018-03-04T05:06:07Z") == int(
+            expected)
+        assert utility.iso8601_to_epoch(
+            "2018-03-04T00:06:07.123456-05:00") == expected
+        assert utility.iso8601_to_epoch(
+            "2018-03-04T05:06:07.123456") == expected
+        # Not Halo's format, so it's parsed by dateutil.
+        assert utility.iso8601_to_epoch("March 4 2018 05:06:07 UTC") == int(
+            expected)
+
+    def test_unit_utility_iso8601_now_round_trip(self):
+        now = haloscans.Utility.iso8601_now()
+        assert now.endswith("Z")
+        assert abs(haloscans.Utility.iso8601_to_epoch(now) -
+                   time.time()) < 5
+
+    def test_unit_utility_iso_8601_delta(self):
+        delta = haloscans.Utility.iso_8601_delta("2018-01-01T00:00:01.5Z",
+                                                 "2018-01-01T01:00:00+01:00")
+        assert delta.total_seconds() == 1.5
+
+    def test_unit_utility_order_items_timestamps(self):
+        items = [{"created_at": "2018-01-01T00:00:01Z"},
+                 {"created_at": "2018-01-01T00:00:00.900Z"},
+                 {"created_at": "2018-01-01T01:00:00.500+01:00"}]
+        ordered = haloscans.Utility.order_items(items, "created_at")
+        assert ordered == [items[2], items[1], items[0]]
+
+    def test_unit_utility_create_url_batch_first_page(self):
+        modifiers = {"hello": "world"}
+        url_list = haloscans.Utility.create_url_batch("/v1/scans", 2,
+                                                      modifiers, first_page=4)
+        assert "page=4" in url_list[0]
+        assert "page=5" in url_list[1]
+        assert "page" not in modifiers